@@ -5,148 +5,304 @@ Upload CSV with queries + metadata, get topical groupings
 """
 
 from flask import Flask, render_template, request, jsonify, send_file
-import pandas as pd
+from werkzeug.exceptions import RequestEntityTooLarge
+import csv
+import io
 import json
 import os
+import shutil
+import tempfile
+import threading
+import time
 from datetime import datetime
-from werkzeug.utils import secure_filename
 import sys
 
 # Import our classifier and learning engine
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from telecom_classifier import TelecomClassifier
+import metrics
+from telecom_classifier import TelecomClassifier, normalize_query
 from learning_engine import LearningEngine
+from request_coalescer import RequestCoalescer
+from export_results import COLUMNAR_FORMATS, EXPORT_FORMATS, ExportCache, columnar_export_available
+from upload_reader import (QUERY_COLUMN_NAMES, MissingQueryColumnError, UploadIndex, UploadReadError,
+                           UploadRejectedError, detect_query_column, read_upload_file, receive_upload)
+
+try:
+    import orjson  # optional: encodes classification results several times faster than json
+except ImportError:
+    orjson = None
 
 app = Flask(__name__)
 app.config['UPLOAD_FOLDER'] = 'uploads'
 app.config['RESULTS_FOLDER'] = 'results'
 app.config['LEARNING_FOLDER'] = 'learning'
+app.config['EXPORT_CACHE_FOLDER'] = os.path.join('results', 'exports')
+app.config['EXPORT_CACHE_MAX_BYTES'] = 2 * 1024 * 1024 * 1024  # 2 GB of built exports
+app.config['EXPORT_CACHE_MAX_AGE'] = 7 * 24 * 3600  # rebuild exports older than a week
+app.config['UPLOAD_INDEX_MAX_ENTRIES'] = 1000  # classified uploads remembered for reuse
+app.config['UPLOAD_INDEX_MAX_AGE'] = 30 * 24 * 3600  # forget uploads whose results are older than 30 days
 app.config['MAX_CONTENT_LENGTH'] = 100 * 1024 * 1024  # 100 MB max file size
 app.config['ALLOWED_EXTENSIONS'] = {'csv', 'xlsx', 'xls', 'tsv', 'txt'}
+app.config['MAX_CLASSIFY_BATCH'] = 10000  # queries per /api/classify request
+app.config['COALESCE_WINDOW'] = 0.002  # seconds concurrent /api/classify requests wait to share a batch
+app.config['COALESCE_MAX_BATCH'] = 256  # queries per coalesced batch (bigger requests run on their own)
+app.config['STREAM_BATCH_SIZE'] = 256  # /api/classify/stream lines classified (and flushed) together
+# Worker processes share /metrics values through files here (set by gunicorn.conf.py; unset: this process only)
+app.config['METRICS_DIR'] = os.environ.get('METRICS_DIR')
+
+# Request body formats accepted by /api/classify/stream
+STREAM_FORMATS = {
+    'application/x-ndjson': 'ndjson',
+    'application/ndjson': 'ndjson',
+    'application/jsonl': 'ndjson',
+    'text/csv': 'csv'
+}
 
 # Create necessary directories
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 os.makedirs(app.config['RESULTS_FOLDER'], exist_ok=True)
 os.makedirs(app.config['LEARNING_FOLDER'], exist_ok=True)
+metrics.configure(app.config['METRICS_DIR'])
 
-# Initialize classifier and learning engine
-DECISION_TREE_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'telecom-classification.json')
-classifier = TelecomClassifier(DECISION_TREE_PATH)
-learning_engine = LearningEngine(DECISION_TREE_PATH)
-
-
-def allowed_file(filename):
-    """Check if file extension is allowed"""
-    return '.' in filename and filename.rsplit('.', 1)[1].lower() in app.config['ALLOWED_EXTENSIONS']
+UPLOADS = metrics.Counter('uploads_total', 'Uploads handled, by result (reused, appended or classified)', ['result'])
+UPLOAD_ROWS = metrics.Counter('upload_rows_total', 'Upload rows classified')
+UPLOAD_ROWS_PER_SECOND = metrics.Histogram('upload_rows_per_second', 'Rows classified per second, per upload',
+                                           buckets=(100, 250, 500, 1000, 2500, 5000, 10000, 25000, 50000,
+                                                    100000, 250000, 500000, 1000000))
 
+# Classifier and learning engine are loaded on first use (or by warm_up), not at import:
+# importing the app stays cheap for tools, tests and the gunicorn master.
+# pandas is imported inside the handlers that need it for the same reason
+DECISION_TREE_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'telecom-classification.json')
+_classifier = None
+_learning_engine = None
+_load_lock = threading.Lock()
+_warm_up_thread = None
+upload_index = UploadIndex(os.path.join(app.config['RESULTS_FOLDER'], 'upload_index.json'),
+                           results_dir=app.config['RESULTS_FOLDER'],
+                           max_entries=app.config['UPLOAD_INDEX_MAX_ENTRIES'],
+                           max_age=app.config['UPLOAD_INDEX_MAX_AGE'])
+# Concurrent /api/classify requests share batches and in-flight queries
+classify_coalescer = RequestCoalescer(lambda queries: get_classifier().classify_cached(queries),
+                                      window=app.config['COALESCE_WINDOW'],
+                                      max_batch_size=app.config['COALESCE_MAX_BATCH'],
+                                      cache=lambda: get_classifier().result_cache)
+export_cache = ExportCache(app.config['EXPORT_CACHE_FOLDER'],
+                           max_bytes=app.config['EXPORT_CACHE_MAX_BYTES'],
+                           max_age=app.config['EXPORT_CACHE_MAX_AGE'])
+
+
+# Result columns for queries the classifier could not place
+UNCLASSIFIED_COLUMNS = {
+    'topical_group': 'Unclassified',
+    'L1_category': 'N/A',
+    'L2_subcategory': 'N/A',
+    'L3_intent': 'N/A',
+    'L3_intent_sub': 'N/A',
+    'funnel_stage': 'N/A',
+    'commercial_score': 0,
+    'confidence_score': 0,
+    'classified': False
+}
+
+# Exact-match table for the bulk fast path, rebuilt whenever the classifier is reloaded
+_keyword_table = None
+_keyword_table_source = None
+
+
+def get_classifier():
+    """The shared classifier, loading the decision tree on first use"""
+    global _classifier
+    if _classifier is None:
+        with _load_lock:
+            if _classifier is None:
+                _classifier = TelecomClassifier(DECISION_TREE_PATH)
+    return _classifier
+
+
+def get_learning_engine():
+    """The shared learning engine, created on first use"""
+    global _learning_engine
+    if _learning_engine is None:
+        with _load_lock:
+            if _learning_engine is None:
+                _learning_engine = LearningEngine(DECISION_TREE_PATH)
+    return _learning_engine
+
+
+def warm_up():
+    """Load everything the first classification request would otherwise wait for"""
+    import pandas  # noqa: F401
+    get_classifier()
+    get_learning_engine()
+
+
+def start_warm_up():
+    """Run warm_up in a background thread, once per process"""
+    global _warm_up_thread
+    with _load_lock:
+        if _warm_up_thread is None:
+            _warm_up_thread = threading.Thread(target=warm_up, name='warm-up', daemon=True)
+            _warm_up_thread.start()
+
+
+def classification_columns(classification):
+    """Flatten a classifier result into the result-file columns"""
+    if not classification:
+        return dict(UNCLASSIFIED_COLUMNS)
+    levels = classification['classification']
+    return {
+        'topical_group': levels['L4']['topic'],
+        'L1_category': levels['L1']['name'],
+        'L2_subcategory': levels['L2']['name'],
+        'L3_intent': levels['L3']['intent_category'],
+        'L3_intent_sub': levels['L3']['intent_subcategory'],
+        'funnel_stage': levels['L3']['funnel_stage'],
+        'commercial_score': levels['L3']['commercial_score'],
+        'confidence_score': round(classification['confidence_score'], 2),
+        'classified': True
+    }
 
-def read_upload_file(filepath):
-    """Read uploaded file into DataFrame"""
-    ext = filepath.rsplit('.', 1)[1].lower()
 
-    try:
-        if ext == 'csv':
-            # Try different encodings and delimiters
-            try:
-                df = pd.read_csv(filepath, encoding='utf-8')
-            except:
-                try:
-                    df = pd.read_csv(filepath, encoding='latin1')
-                except:
-                    df = pd.read_csv(filepath, encoding='utf-8', sep='\t')
-        elif ext in ['xlsx', 'xls']:
-            df = pd.read_excel(filepath)
-        elif ext == 'tsv':
-            df = pd.read_csv(filepath, sep='\t')
-        elif ext == 'txt':
-            # Assume one query per line
-            with open(filepath, 'r', encoding='utf-8') as f:
-                queries = [line.strip() for line in f if line.strip()]
-            df = pd.DataFrame({'Query': queries})
+def get_keyword_table():
+    """Normalized keyword -> result columns for every exact keyword in the current classifier"""
+    import pandas as pd
+    global _keyword_table, _keyword_table_source
+    classifier = get_classifier()
+    if _keyword_table_source is not classifier:
+        records = []
+        for keyword, match in classifier.keywords_index.items():
+            row = classification_columns({'classification': match, 'confidence_score': 1.0})
+            row['query_norm'] = keyword
+            records.append(row)
+        _keyword_table = pd.DataFrame.from_records(records, columns=['query_norm'] + list(UNCLASSIFIED_COLUMNS))
+        _keyword_table_source = classifier
+    return _keyword_table
+
+
+def json_loads(body):
+    """Parse a JSON request body (raises ValueError on invalid JSON)"""
+    return orjson.loads(body) if orjson is not None else json.loads(body)
+
+
+def json_dumps(payload):
+    """Compact UTF-8 JSON bytes"""
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def json_response(payload, status=200):
+    """jsonify for the hot API paths: orjson when installed, no pretty-printing"""
+    return app.response_class(json_dumps(payload), status=status, mimetype='application/json')
+
+
+def iter_stream_queries(body, fmt):
+    """
+    (line number, query, error) per line of a streamed request body
+    NDJSON lines are a JSON string or {"query": ...}; a line that is neither
+    yields an error instead of a query. CSV takes the query from the column
+    whose header is a query column name, else from the first column (no header)
+    """
+    if fmt == 'csv':
+        rows = csv.reader(io.TextIOWrapper(body, encoding='utf-8-sig', errors='replace', newline=''))
+        column = 0
+        for row in rows:
+            if rows.line_num == 1:
+                names = [cell.strip().lower() for cell in row]
+                header = next((i for i, name in enumerate(names) if name in QUERY_COLUMN_NAMES), None)
+                if header is not None:
+                    column = header
+                    continue
+            if row:
+                yield rows.line_num, row[column] if column < len(row) else '', None
+        return
+
+    for line_number, line in enumerate(body, 1):
+        if not line.strip():
+            continue
+        try:
+            value = json_loads(line)
+        except ValueError:
+            yield line_number, None, 'Invalid JSON'
+            continue
+        if isinstance(value, dict):
+            value = value.get('query')
+        if not isinstance(value, str):
+            yield line_number, None, 'Expected a JSON string or {"query": "..."}'
+            continue
+        yield line_number, value, None
+
+
+def encode_stream_batch(classifier, items):
+    """NDJSON lines for a batch of iter_stream_queries items, in input order"""
+    results = iter(classifier.classify_cached([query for _, query, error in items if error is None]))
+    lines = []
+    for line_number, query, error in items:
+        if error is None:
+            lines.append(json_dumps({'query': query, 'result': next(results)}))
         else:
-            return None
+            lines.append(json_dumps({'line': line_number, 'error': error}))
+    lines.append(b'')
+    return b'\n'.join(lines)
 
-        return df
-    except Exception as e:
-        print(f"Error reading file: {e}")
-        return None
 
-
-def detect_query_column(df):
-    """Detect which column contains the queries/keywords"""
-    possible_names = ['query', 'keyword', 'keywords', 'search term', 'search query',
-                     'term', 'queries', 'search', 'phrase', 'key phrase']
-
-    # Check exact matches (case-insensitive)
-    for col in df.columns:
-        if col.lower() in possible_names:
-            return col
-
-    # Check partial matches
-    for col in df.columns:
-        for name in possible_names:
-            if name in col.lower():
-                return col
-
-    # Default to first column if text-heavy
-    if len(df.columns) > 0:
-        first_col = df.columns[0]
-        # Check if first column looks like queries (mostly strings, reasonable length)
-        if df[first_col].dtype == 'object':
-            return first_col
-
-    return None
+def results_exist(entry):
+    """Whether the results file of an upload index entry is still on disk"""
+    return os.path.exists(os.path.join(app.config['RESULTS_FOLDER'], entry['results_filename']))
 
 
 def classify_queries(df, query_column):
-    """Classify all queries in the dataframe"""
-    results = []
-
-    for idx, row in df.iterrows():
-        query = str(row[query_column]).strip()
-
-        if not query or query.lower() in ['nan', 'none', '']:
-            # Skip empty queries
-            classification = None
-        else:
-            classification = classifier.classify_text(query)
-
-        # Build result row
-        result = {
-            'original_index': idx,
-            'query': query,
-        }
-
-        # Add all original columns
-        for col in df.columns:
-            if col != query_column:
-                result[col] = row[col]
-
-        # Add classification if found
-        if classification:
-            result['topical_group'] = classification['classification']['L4']['topic']
-            result['L1_category'] = classification['classification']['L1']['name']
-            result['L2_subcategory'] = classification['classification']['L2']['name']
-            result['L3_intent'] = classification['classification']['L3']['intent_category']
-            result['L3_intent_sub'] = classification['classification']['L3']['intent_subcategory']
-            result['funnel_stage'] = classification['classification']['L3']['funnel_stage']
-            result['commercial_score'] = classification['classification']['L3']['commercial_score']
-            result['confidence_score'] = round(classification['confidence_score'], 2)
-            result['classified'] = True
-        else:
-            result['topical_group'] = 'Unclassified'
-            result['L1_category'] = 'N/A'
-            result['L2_subcategory'] = 'N/A'
-            result['L3_intent'] = 'N/A'
-            result['L3_intent_sub'] = 'N/A'
-            result['funnel_stage'] = 'N/A'
-            result['commercial_score'] = 0
-            result['confidence_score'] = 0
-            result['classified'] = False
-
-        results.append(result)
-
-    return pd.DataFrame(results)
+    """
+    Classify all queries in the dataframe
+    Distinct queries are joined to the exact-match keyword table in one merge;
+    only misses, exact hits whose detected intent points to another
+    category and verbatim keyword overrides go through the classifier
+    (as one batch)
+    Rows and rows per second are recorded for /metrics
+    """
+    import pandas as pd
+    start = time.perf_counter()
+    classifier = get_classifier()
+    queries = df[query_column].astype(str).str.strip()
+    empty = queries.str.lower().isin(['nan', 'none', ''])
+
+    # One row per distinct non-empty query, matched on the normalized form
+    lookup = pd.DataFrame({'query': queries[~empty].unique()})
+    lookup['query_norm'] = [normalize_query(query, stem=classifier.stem) for query in lookup['query']]
+    hits = lookup.merge(get_keyword_table(), how='inner', on='query_norm').drop(columns='query_norm')
+
+    # An exact hit stands unless the query's intent points to another category, or the
+    # query is literally a keyword classified differently from its normalized key
+    aligned = [(expected is None or expected == l1_category) and query.lower() not in classifier.verbatim_overrides
+               for query, expected, l1_category in zip(hits['query'], map(classifier.expected_category, hits['query']),
+                                                       hits['L1_category'])]
+    hits = hits.loc[aligned]
+
+    # Everything else takes the full classification path
+    misses = lookup['query'][~lookup['query'].isin(hits['query'])].tolist()
+    classified = pd.DataFrame.from_records(
+        [classification_columns(result) for result in classifier.classify_batch(misses)],
+        columns=list(UNCLASSIFIED_COLUMNS))
+
+    # Empty queries all join on '' to the unclassified row
+    lookup = pd.concat([hits, classified.assign(query=misses),
+                        pd.DataFrame([{'query': '', **UNCLASSIFIED_COLUMNS}])], ignore_index=True)
+
+    # Back to one row per input row, in input order
+    keys = pd.DataFrame({'query': queries.mask(empty, '')})
+    rows = keys.merge(lookup, how='left', on='query')
+    rows['classified'] = rows['classified'].astype(bool)
+
+    other_columns = df.drop(columns=[query_column]).reset_index(drop=True)
+    results = pd.concat([pd.DataFrame({'original_index': df.index, 'query': queries.to_numpy()}),
+                         other_columns, rows[list(UNCLASSIFIED_COLUMNS)]], axis=1)
+
+    elapsed = time.perf_counter() - start
+    UPLOAD_ROWS.inc(len(df))
+    if len(df) and elapsed > 0:
+        UPLOAD_ROWS_PER_SECOND.observe(len(df) / elapsed)
+    return results
 
 
 def generate_summary(df):
@@ -200,39 +356,165 @@ def index():
     return render_template('index.html')
 
 
+@app.route('/api/ready')
+def ready():
+    """Readiness probe: 200 once the classifier indexes are loaded, 503 (and loading) before"""
+    classifier = _classifier
+    if classifier is None:
+        start_warm_up()
+        return jsonify({'ready': False}), 503
+    return jsonify({
+        'ready': True,
+        'taxonomy_version': classifier.taxonomy_version,
+        'keywords': len(classifier.keywords_index),
+        'topics': len(classifier.topics),
+        'pid': os.getpid()
+    })
+
+
+@app.route('/metrics')
+def prometheus_metrics():
+    """Counters and histograms in the Prometheus text format (all workers when METRICS_DIR is shared)"""
+    return app.response_class(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+
+@app.route('/api/classify', methods=['POST'])
+def classify_api():
+    """
+    Classify queries sent as JSON: {"query": "..."} for one query, or
+    {"queries": [...]} / a bare array for up to MAX_CLASSIFY_BATCH
+    Results have the classify_text structure (null when unclassified)
+    """
+    try:
+        payload = json_loads(request.get_data(cache=False))
+    except ValueError:
+        return json_response({'error': 'Request body must be JSON'}, 400)
+
+    single = isinstance(payload, dict) and 'query' in payload
+    if single:
+        queries = [payload['query']]
+    elif isinstance(payload, dict):
+        queries = payload.get('queries')
+    else:
+        queries = payload
+    if not isinstance(queries, list) or not all(isinstance(query, str) for query in queries):
+        return json_response({'error': 'Expected {"query": "..."} or a list of query strings'}, 400)
+    if len(queries) > app.config['MAX_CLASSIFY_BATCH']:
+        return json_response({'error': f"At most {app.config['MAX_CLASSIFY_BATCH']} queries per request"}, 413)
+
+    classifier = get_classifier()
+    results = classify_coalescer.classify(queries)
+    if single:
+        return json_response({'result': results[0], 'taxonomy_version': classifier.taxonomy_version})
+    return json_response({'results': results, 'count': len(results),
+                          'taxonomy_version': classifier.taxonomy_version})
+
+
+@app.route('/api/classify/stream', methods=['POST'])
+def classify_stream():
+    """
+    Classify a body of NDJSON or CSV lines, streaming NDJSON results back
+    Lines are classified and written in batches of STREAM_BATCH_SIZE, so the
+    results are never held in memory and the first ones arrive right away
+    """
+    fmt = STREAM_FORMATS.get(request.mimetype)
+    if fmt is None:
+        return json_response({'error': 'Send NDJSON (application/x-ndjson) or CSV (text/csv) lines'}, 415)
+    if request.content_length and request.content_length > app.config['MAX_CONTENT_LENGTH']:
+        return json_response({'error': 'Request body too large (max 100 MB)'}, 413)
+
+    # HTTP clients send the whole body before reading the response; results written
+    # while the client is still sending would fill both socket buffers and stall.
+    # The body is spooled to a temporary file first, so memory stays flat either way
+    body = tempfile.TemporaryFile()
+    try:
+        shutil.copyfileobj(request.stream, body)
+    except RequestEntityTooLarge:
+        body.close()
+        return json_response({'error': 'Request body too large (max 100 MB)'}, 413)
+    body.seek(0)
+
+    classifier = get_classifier()
+    batch_size = app.config['STREAM_BATCH_SIZE']
+
+    def generate():
+        with body:
+            batch = []
+            for item in iter_stream_queries(body, fmt):
+                batch.append(item)
+                if len(batch) >= batch_size:
+                    yield encode_stream_batch(classifier, batch)
+                    batch = []
+            if batch:
+                yield encode_stream_batch(classifier, batch)
+
+    return app.response_class(generate(), mimetype='application/x-ndjson')
+
+
 @app.route('/upload', methods=['POST'])
 def upload_file():
     """Handle file upload and classification"""
+    import pandas as pd
 
-    # Check if file is present
-    if 'file' not in request.files:
+    if request.mimetype != 'multipart/form-data' or 'boundary' not in request.mimetype_params:
         return jsonify({'error': 'No file provided'}), 400
 
-    file = request.files['file']
-
-    if file.filename == '':
-        return jsonify({'error': 'No file selected'}), 400
+    if request.content_length and request.content_length > app.config['MAX_CONTENT_LENGTH']:
+        return jsonify({'error': 'File too large (max 100 MB)'}), 413
 
-    if not allowed_file(file.filename):
-        return jsonify({'error': 'Invalid file type. Please upload CSV, Excel, or TXT file'}), 400
+    # Stream the body straight to disk; the header is checked on the first chunk.
+    # Earlier uploads this one could extend get their prefix hashed on the way
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    taxonomy_version = get_classifier().taxonomy_version
+    prefix_candidates = upload_index.prefix_candidates(taxonomy_version, request.content_length)
+    try:
+        upload = receive_upload(request.stream, request.mimetype_params['boundary'].encode(),
+                                app.config['UPLOAD_FOLDER'], app.config['ALLOWED_EXTENSIONS'], timestamp,
+                                checkpoints=[entry['size'] for entry in prefix_candidates])
+    except RequestEntityTooLarge:
+        # Body over MAX_CONTENT_LENGTH, or a form part the multipart decoder cannot bound
+        return jsonify({'error': 'File too large (max 100 MB)'}), 413
+    except UploadRejectedError as e:
+        return jsonify({'error': str(e)}), 400
+    except MissingQueryColumnError:
+        return jsonify({'error': 'Could not detect query column. Please ensure your file has a column named "Query" or "Keyword"'}), 400
+    except UploadReadError as e:
+        print(f"Error reading file: {e}")
+        return jsonify({'error': 'Could not read file. Please check format'}), 400
 
     try:
-        # Save uploaded file
-        filename = secure_filename(file.filename)
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        saved_filename = f"{timestamp}_{filename}"
-        filepath = os.path.join(app.config['UPLOAD_FOLDER'], saved_filename)
-        file.save(filepath)
-
-        # Read file
-        df = read_upload_file(filepath)
-        if df is None:
+        filepath = upload['path']
+        metadata_columns = upload['fields'].get('columns') or None
+
+        # Identical file (and column selection) already classified with this taxonomy
+        previous = upload_index.get(upload['sha256'], taxonomy_version, metadata_columns)
+        if previous is not None and not results_exist(previous):
+            previous = None
+        if previous is not None:
+            UPLOADS.labels('reused').inc()
+            os.remove(filepath)
+            results_path = os.path.join(app.config['RESULTS_FOLDER'], previous['results_filename'])
+            return jsonify({
+                'success': True,
+                'summary': previous['summary'],
+                'columns_info': previous['columns_info'],
+                'results_filename': previous['results_filename'],
+                'data': pd.read_csv(results_path, nrows=100).fillna('').to_dict('records'),
+                'total_rows': previous['total_rows'],
+                'reused': True
+            })
+
+        # Read file (single pass: query column + requested metadata columns, default all)
+        try:
+            df = read_upload_file(filepath, metadata_columns)
+        except MissingQueryColumnError:
+            return jsonify({'error': 'Could not detect query column. Please ensure your file has a column named "Query" or "Keyword"'}), 400
+        except UploadReadError as e:
+            print(f"Error reading file: {e}")
             return jsonify({'error': 'Could not read file. Please check format'}), 400
 
         # Detect query column
         query_column = detect_query_column(df)
-        if query_column is None:
-            return jsonify({'error': 'Could not detect query column. Please ensure your file has a column named "Query" or "Keyword"'}), 400
 
         # Get column info for frontend
         columns_info = {
@@ -242,16 +524,40 @@ def upload_file():
             'sample_data': df.head(5).to_dict('records')
         }
 
-        # Classify queries
-        results_df = classify_queries(df, query_column)
+        results_filename = f"results_{timestamp}.csv"
+        results_path = os.path.join(app.config['RESULTS_FOLDER'], results_filename)
+
+        # Same bytes as an earlier upload plus appended rows: only the new rows are classified
+        base = UploadIndex.find_prefix(upload, metadata_columns,
+                                       [entry for entry in prefix_candidates if results_exist(entry)])
+        if base is not None and base['total_rows'] <= len(df):
+            base_path = os.path.join(app.config['RESULTS_FOLDER'], base['results_filename'])
+            UPLOADS.labels('appended').inc()
+            new_results_df = classify_queries(df.iloc[base['total_rows']:], query_column)
+            shutil.copyfile(base_path, results_path)
+            new_results_df.to_csv(results_path, mode='a', header=False, index=False)
+            results_df = pd.concat([pd.read_csv(base_path), new_results_df], ignore_index=True)
+        else:
+            # Classify queries
+            UPLOADS.labels('classified').inc()
+            results_df = classify_queries(df, query_column)
+            results_df.to_csv(results_path, index=False)
 
         # Generate summary
         summary = generate_summary(results_df)
 
-        # Save results
-        results_filename = f"results_{timestamp}.csv"
-        results_path = os.path.join(app.config['RESULTS_FOLDER'], results_filename)
-        results_df.to_csv(results_path, index=False)
+        upload_index.add({
+            'sha256': upload['sha256'],
+            'taxonomy_version': taxonomy_version,
+            'columns': metadata_columns,
+            'ext': upload['ext'],
+            'size': upload['size'],
+            'upload_filename': upload['filename'],
+            'results_filename': results_filename,
+            'total_rows': len(df),
+            'summary': summary,
+            'columns_info': columns_info
+        })
 
         # Prepare data for frontend (replace NaN with None for JSON)
         results_df_clean = results_df.fillna('')
@@ -287,53 +593,35 @@ def download_file(filename):
 
 @app.route('/export/<filename>/<format>')
 def export_file(filename, format):
-    """Export results in different formats"""
+    """Export results in different formats (built once per results content, then cached)"""
     filepath = os.path.join(app.config['RESULTS_FOLDER'], filename)
 
     if not os.path.exists(filepath):
         return jsonify({'error': 'File not found'}), 404
 
-    df = pd.read_csv(filepath)
-
-    if format == 'excel':
-        # Export to Excel with multiple sheets
-        output_filename = filename.replace('.csv', '.xlsx')
-        output_path = os.path.join(app.config['RESULTS_FOLDER'], output_filename)
-
-        with pd.ExcelWriter(output_path, engine='openpyxl') as writer:
-            # All data
-            df.to_excel(writer, sheet_name='All Data', index=False)
-
-            # Grouped by topic
-            if 'topical_group' in df.columns:
-                topic_summary = df.groupby('topical_group').size().reset_index(name='count')
-                topic_summary = topic_summary.sort_values('count', ascending=False)
-                topic_summary.to_excel(writer, sheet_name='Topics Summary', index=False)
-
-            # Grouped by L1
-            if 'L1_category' in df.columns:
-                l1_summary = df.groupby('L1_category').size().reset_index(name='count')
-                l1_summary = l1_summary.sort_values('count', ascending=False)
-                l1_summary.to_excel(writer, sheet_name='L1 Categories', index=False)
-
-        return send_file(output_path, as_attachment=True)
+    if format not in EXPORT_FORMATS:
+        return jsonify({'error': 'Invalid format'}), 400
 
-    elif format == 'grouped-csv':
-        # Export CSV sorted by topical group
-        df_sorted = df.sort_values(['L1_category', 'L2_subcategory', 'topical_group', 'query'])
-        output_filename = filename.replace('.csv', '_grouped.csv')
-        output_path = os.path.join(app.config['RESULTS_FOLDER'], output_filename)
-        df_sorted.to_csv(output_path, index=False)
+    if format in COLUMNAR_FORMATS and not columnar_export_available():
+        # Typed Parquet / Arrow IPC need the optional pyarrow package
+        return jsonify({'error': 'Parquet/Arrow export requires pyarrow (pip install pyarrow)'}), 501
 
-        return send_file(output_path, as_attachment=True)
+    # excel: streamed workbook (All Data split past the Excel row limit, Topics Summary, L1 Categories)
+    # grouped-csv: sorted by L1 > L2 > topic > query
+    # parquet / arrow: typed columns, dictionary-encoded labels
+    output_path, etag = export_cache.get(filepath, format)
+    extension, mimetype = EXPORT_FORMATS[format]
 
-    else:
-        return jsonify({'error': 'Invalid format'}), 400
+    # conditional=True answers If-None-Match / If-Modified-Since with 304
+    return send_file(output_path, as_attachment=True, mimetype=mimetype,
+                     download_name=os.path.splitext(filename)[0] + extension,
+                     etag=etag, conditional=True)
 
 
 @app.route('/api/group-details/<filename>/<group_name>')
 def get_group_details(filename, group_name):
     """Get all queries for a specific topical group"""
+    import pandas as pd
     filepath = os.path.join(app.config['RESULTS_FOLDER'], filename)
 
     if not os.path.exists(filepath):
@@ -352,6 +640,8 @@ def get_group_details(filename, group_name):
 @app.route('/api/learn', methods=['POST'])
 def apply_learning():
     """Analyze unclassified queries and update decision tree"""
+    import pandas as pd
+    global _classifier
     try:
         data = request.json
         filename = data.get('filename')
@@ -377,6 +667,7 @@ def apply_learning():
             })
 
         # Analyze each unclassified query
+        learning_engine = get_learning_engine()
         suggestions = []
         for _, row in unclassified.iterrows():
             query = row['query']
@@ -392,8 +683,7 @@ def apply_learning():
             result = learning_engine.update_decision_tree(suggestions, min_confidence=50)
 
             # Reload classifier with updated tree
-            global classifier
-            classifier = TelecomClassifier(DECISION_TREE_PATH)
+            _classifier = TelecomClassifier(DECISION_TREE_PATH)
 
             # Save learning log
             learning_log_path = os.path.join(app.config['LEARNING_FOLDER'],
@@ -451,6 +741,7 @@ def save_feedback():
 @app.route('/api/correction', methods=['POST'])
 def save_correction():
     """Save user corrections for false positives"""
+    import pandas as pd
     try:
         data = request.json
 
@@ -566,6 +857,7 @@ def get_feedback():
 @app.route('/api/get-corrections', methods=['GET'])
 def get_corrections():
     """Get all corrections data"""
+    import pandas as pd
     try:
         corrections_file = os.path.join(app.config['LEARNING_FOLDER'], 'corrections', 'corrections_master.csv')
 
@@ -582,6 +874,7 @@ def get_corrections():
 @app.route('/api/export-feedback-excel', methods=['GET'])
 def export_feedback_excel():
     """Export feedback as Excel file"""
+    import pandas as pd
     try:
         feedback_dir = os.path.join(app.config['LEARNING_FOLDER'], 'feedback')
         all_feedback = []
@@ -645,4 +938,8 @@ if __name__ == '__main__':
     print(f"📊 Feedback Viewer: http://localhost:{port}/feedback-viewer")
     print("=" * 80)
 
+    # The debug reloader re-runs this module in a child process; only the child serves
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        warm_up()
+
     app.run(debug=True, host='0.0.0.0', port=port)
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+Asyncio Front-End for the Classifier
+Runs TelecomClassifier in a process pool behind an asyncio API:
+
+    async with AsyncClassifier('telecom-classification.json') as classifier:
+        result = await classifier.classify('buy unlimited plan')
+        async for result in classifier.classify_stream(queries):
+            ...
+
+Concurrent classify() calls are queued and dispatched as micro-batches: the
+dispatcher takes whatever arrives within batch_window seconds (up to
+max_batch_size queries) and sends it to a worker as one classify_batch call,
+so pickling and IPC are paid per batch instead of per query. At most one
+batch per worker is in flight; once max_pending queries are waiting,
+classify() blocks until the workers catch up (backpressure).
+"""
+
+import asyncio
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import AsyncIterable, AsyncIterator, Dict, Iterable, List, Optional, Union
+
+from telecom_classifier import TelecomClassifier
+
+
+# Classifier of this worker process, built by _init_worker
+_worker_classifier = None
+
+
+def _init_worker(decision_tree_path: str, options: Dict):
+    global _worker_classifier
+    _worker_classifier = TelecomClassifier(decision_tree_path, **options)
+
+
+def classify_in_worker(queries: List[str]) -> List[Optional[Dict]]:
+    """Classify a batch in a pool worker (repeated queries come from the worker's result cache)"""
+    return _worker_classifier.classify_cached(queries)
+
+
+def create_worker_pool(decision_tree_path: str, workers: Optional[int] = None, **options) -> ProcessPoolExecutor:
+    """Process pool whose workers each load the decision tree once"""
+    return ProcessPoolExecutor(max_workers=workers or os.cpu_count() or 1, initializer=_init_worker,
+                               initargs=(decision_tree_path, options))
+
+
+class AsyncClassifier:
+    """
+    Micro-batching asyncio wrapper around a pool of TelecomClassifier processes
+
+    batch_window: seconds the dispatcher waits for more queries after the first
+    max_batch_size: queries per worker call
+    max_pending: queued queries before classify() waits (backpressure)
+    Other keyword arguments are passed to TelecomClassifier in each worker.
+    """
+
+    def __init__(self, decision_tree_path: str, workers: Optional[int] = None, batch_window: float = 0.002,
+                 max_batch_size: int = 256, max_pending: int = 10000, **options):
+        self.decision_tree_path = decision_tree_path
+        self.workers = workers or os.cpu_count() or 1
+        self.batch_window = batch_window
+        self.max_batch_size = max_batch_size
+        self.max_pending = max_pending
+        self.options = options
+        self._executor = None
+        self._queue = None
+        self._slots = None
+        self._dispatcher = None
+
+    async def start(self):
+        """Start the worker pool and the dispatcher (called by async with)"""
+        if self._dispatcher is not None:
+            return
+        loop = asyncio.get_running_loop()
+        self._executor = create_worker_pool(self.decision_tree_path, self.workers, **self.options)
+        self._queue = asyncio.Queue(maxsize=self.max_pending)
+        self._slots = asyncio.Semaphore(self.workers)
+        # Load the taxonomy in the workers now rather than on the first request
+        await asyncio.gather(*(loop.run_in_executor(self._executor, classify_in_worker, [])
+                               for _ in range(self.workers)))
+        self._dispatcher = asyncio.create_task(self._dispatch())
+
+    async def close(self):
+        """Stop dispatching and shut the worker pool down"""
+        if self._dispatcher is not None:
+            self._dispatcher.cancel()
+            try:
+                await self._dispatcher
+            except asyncio.CancelledError:
+                pass
+            self._dispatcher = None
+            # Queries still queued will never be dispatched
+            while not self._queue.empty():
+                self._queue.get_nowait()[1].cancel()
+        if self._executor is not None:
+            await asyncio.get_running_loop().run_in_executor(None, self._executor.shutdown)
+            self._executor = None
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def _submit(self, query: str) -> asyncio.Future:
+        """Queue a query and return the future of its result (waits while the queue is full)"""
+        if self._dispatcher is None:
+            raise RuntimeError("AsyncClassifier is not started (use 'async with' or await start())")
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((query, future))
+        return future
+
+    async def classify(self, query: str) -> Optional[Dict]:
+        """Classify one query (the classify_text result structure)"""
+        return await (await self._submit(query))
+
+    async def classify_batch(self, queries: Iterable[str]) -> List[Optional[Dict]]:
+        """Classify queries concurrently, results in input order"""
+        futures = [await self._submit(query) for query in queries]
+        return list(await asyncio.gather(*futures))
+
+    async def classify_stream(self, queries: Union[AsyncIterable[str], Iterable[str]],
+                              max_in_flight: Optional[int] = None) -> AsyncIterator[Optional[Dict]]:
+        """
+        Yield results in input order while reading queries from a (sync or async) iterable
+        At most max_in_flight queries (default: one full batch per worker) are
+        read ahead of the results consumed, so a slow consumer slows the reader
+        """
+        limit = max_in_flight or self.max_batch_size * self.workers
+        pending = deque()
+
+        if hasattr(queries, '__aiter__'):
+            async for query in queries:
+                pending.append(await self._submit(query))
+                if len(pending) >= limit:
+                    yield await pending.popleft()
+        else:
+            for query in queries:
+                pending.append(await self._submit(query))
+                if len(pending) >= limit:
+                    yield await pending.popleft()
+
+        while pending:
+            yield await pending.popleft()
+
+    async def _dispatch(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            # One batch per worker in flight; while all are busy, queries pile up in the
+            # bounded queue and go out together as soon as a worker frees up
+            await self._slots.acquire()
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.batch_window
+            while len(batch) < self.max_batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except asyncio.QueueEmpty:
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        break
+                    await asyncio.sleep(remaining)
+
+            unique = list(dict.fromkeys(query for query, _ in batch))
+            try:
+                work = loop.run_in_executor(self._executor, classify_in_worker, unique)
+            except Exception as error:
+                # e.g. a broken or shut-down pool: fail this batch and keep dispatching
+                self._slots.release()
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(error)
+                continue
+            work.add_done_callback(lambda done, batch=batch, unique=unique: self._deliver(done, batch, unique))
+
+    def _deliver(self, done: asyncio.Future, batch: List, unique: List[str]):
+        """Fan a finished batch back out to the waiting futures"""
+        self._slots.release()
+        error = None if done.cancelled() else done.exception()
+        results = None if done.cancelled() or error else dict(zip(unique, done.result()))
+        for query, future in batch:
+            if future.done():
+                continue
+            if results is not None:
+                future.set_result(results[query])
+            elif error is not None:
+                future.set_exception(error)
+            else:
+                future.cancel()
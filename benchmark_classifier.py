@@ -0,0 +1,625 @@
+#!/usr/bin/env python3
+"""
+Classifier Benchmark Suite
+Builds a labelled query set from the taxonomy itself (sampled L5 keywords
+plus perturbed variants) and measures accuracy, latency and memory. The
+sampled keywords are held out: the classifier under test is built from the
+tree without them, so accuracy is measured on keywords it has not indexed.
+
+- Held-out accuracy per L1 category and per query variant
+- Latency percentiles (p50/p95/p99) for single-query classification
+- Queries per second in single and batch mode
+- Index build time and peak RSS
+- Optional micro-benchmarks of individual hot paths (--micro)
+- Optional LSH candidate recall vs the exhaustive Stage 3 scan (--lsh)
+- Cold-start import time of the app and CLI modules (--import-times)
+- Async load test: micro-batched AsyncClassifier vs per-request dispatch (--async-load)
+
+Results are written as JSON so runs can be compared across commits:
+
+    python3 benchmark_classifier.py --tree telecom-classification-10K.json
+    python3 benchmark_classifier.py --tree ... --baseline bench_prev.json
+    python3 benchmark_classifier.py --import-times --output bench_imports.json
+    python3 benchmark_classifier.py --async-load --workers 2 --concurrency 200
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import datetime
+
+from telecom_classifier import TelecomClassifier, normalize_query
+
+
+# Perturbations applied to sampled keywords (each keeps the original L1 label);
+# 'exact' is the held-out keyword as written
+VARIANTS = ['exact', 'swap', 'drop', 'typo', 'case_punct']
+
+# Modules whose cold import is timed by --import-times
+IMPORT_MODULES = ['telecom_classifier', 'fuzzy_index', 'learning_engine', 'upload_reader',
+                  'export_results', 'qa_clustering', 'benchmark_classifier', 'app']
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and kilobytes on Linux
+    if sys.platform == 'darwin':
+        return peak / (1024 * 1024)
+    return peak / 1024
+
+
+def git_commit():
+    """Current commit hash, if available"""
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except Exception:
+        return None
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0
+    rank = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values))) - 1))
+    return sorted_values[rank]
+
+
+def perturb(keyword, variant, rnd):
+    """Return a perturbed copy of keyword, or None if the variant does not apply"""
+    words = keyword.split()
+
+    if variant == 'exact':
+        return keyword
+
+    if variant == 'swap':
+        if len(words) < 2:
+            return None
+        i = rnd.randrange(len(words) - 1)
+        words[i], words[i + 1] = words[i + 1], words[i]
+        return ' '.join(words)
+
+    if variant == 'drop':
+        if len(words) < 3:
+            return None
+        del words[rnd.randrange(len(words))]
+        return ' '.join(words)
+
+    if variant == 'typo':
+        candidates = [i for i, w in enumerate(words) if len(w) >= 5 and w.isalpha()]
+        if not candidates:
+            return None
+        i = rnd.choice(candidates)
+        pos = rnd.randrange(1, len(words[i]) - 1)
+        words[i] = words[i][:pos] + words[i][pos + 1:]
+        return ' '.join(words)
+
+    if variant == 'case_punct':
+        return keyword.title() + '?'
+
+    return None
+
+
+def _iter_topics(taxonomy):
+    """(L1, L4) of every topic in a taxonomy"""
+    for l1 in taxonomy.get('L1_categories', []):
+        for l2 in l1.get('L2_subcategories', []):
+            for l3 in l2.get('L3_intents', []):
+                for l4 in l3.get('L4_topics', []):
+                    yield l1, l4
+
+
+def split_taxonomy(tree_path, sample_size, seed):
+    """
+    Hold out a sample of L5 keywords (distinct normalized forms)
+    Returns (decision tree without them, [(keyword, expected L1)]). Every
+    spelling that normalizes to a held-out keyword is removed, so no variant
+    of a test keyword stays in the index the classifier is built from.
+    """
+    with open(tree_path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    taxonomy = data.get('taxonomy', data)
+
+    expected_l1 = {}
+    for l1, l4 in _iter_topics(taxonomy):
+        for l5 in l4.get('L5_keywords', []):
+            expected_l1.setdefault(normalize_query(l5.get('keyword', '')), l1['name'])
+    expected_l1.pop('', None)
+
+    rnd = random.Random(seed)
+    held_out = rnd.sample(sorted(expected_l1), min(sample_size, len(expected_l1)))
+    removed = set(held_out)
+    for _, l4 in _iter_topics(taxonomy):
+        l4['L5_keywords'] = [l5 for l5 in l4.get('L5_keywords', [])
+                             if normalize_query(l5.get('keyword', '')) not in removed]
+    return data, [(keyword, expected_l1[keyword]) for keyword in held_out]
+
+
+def build_labelled_set(keywords, seed):
+    """
+    Derive perturbed query variants of (keyword, expected L1) pairs
+    Returns a list of {'query', 'expected_l1', 'variant', 'keyword'} dicts
+    """
+    rnd = random.Random(seed)
+    labelled = []
+    for keyword, expected_l1 in keywords:
+        for variant in VARIANTS:
+            query = perturb(keyword, variant, rnd)
+            if query:
+                labelled.append({
+                    'query': query,
+                    'expected_l1': expected_l1,
+                    'variant': variant,
+                    'keyword': keyword
+                })
+    return labelled
+
+
+def measure_accuracy(labelled, results):
+    """Accuracy per L1 category and per variant"""
+    per_l1 = defaultdict(lambda: {'total': 0, 'correct': 0, 'classified': 0})
+    per_variant = defaultdict(lambda: {'total': 0, 'correct': 0})
+
+    for item, result in zip(labelled, results):
+        actual_l1 = result['classification']['L1']['name'] if result else None
+        correct = actual_l1 == item['expected_l1']
+
+        l1_stats = per_l1[item['expected_l1']]
+        l1_stats['total'] += 1
+        l1_stats['correct'] += int(correct)
+        l1_stats['classified'] += int(result is not None)
+
+        variant_stats = per_variant[item['variant']]
+        variant_stats['total'] += 1
+        variant_stats['correct'] += int(correct)
+
+    for stats in list(per_l1.values()) + list(per_variant.values()):
+        stats['accuracy'] = stats['correct'] / stats['total'] if stats['total'] else 0
+
+    total = len(labelled)
+    correct = sum(s['correct'] for s in per_l1.values())
+    return {
+        'overall': correct / total if total else 0,
+        'per_l1': dict(sorted(per_l1.items())),
+        'per_variant': dict(per_variant)
+    }
+
+
+def micro_benchmark_scoring(classifier, queries, repeat=3):
+    """
+    Full-scan match scoring with precomputed keyword token sets versus
+    re-splitting every keyword on every call (the pre-index behaviour)
+    """
+    score = classifier._calculate_match_score
+    entries = classifier.keyword_entries
+    prepared = []
+    for query in queries:
+        query_norm = classifier._normalize(query)
+        prepared.append((query_norm, set(query_norm.split())))
+
+    def best_of(fn):
+        timings = []
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            fn()
+            timings.append(time.perf_counter() - t0)
+        return min(timings)
+
+    def precomputed():
+        for query_norm, query_words in prepared:
+            for keyword, keyword_words, _, _ in entries:
+                score(query_norm, query_words, keyword, keyword_words)
+
+    def resplit():
+        for query_norm, query_words in prepared:
+            for keyword, _, _, _ in entries:
+                score(query_norm, query_words, keyword, frozenset(keyword.split()))
+
+    precomputed_seconds = best_of(precomputed)
+    resplit_seconds = best_of(resplit)
+    scored = len(prepared) * len(entries)
+    return {
+        'queries': len(prepared),
+        'keywords': len(entries),
+        'precomputed_ns_per_keyword': round(precomputed_seconds / scored * 1e9, 1) if scored else 0,
+        'resplit_ns_per_keyword': round(resplit_seconds / scored * 1e9, 1) if scored else 0,
+        'speedup': round(resplit_seconds / precomputed_seconds, 2) if precomputed_seconds else 0
+    }
+
+
+def run_micro_benchmarks(classifier, queries):
+    """Micro-benchmarks of individual hot paths"""
+    return {
+        'match_scoring': micro_benchmark_scoring(classifier, queries)
+    }
+
+
+def parse_lsh_configs(spec):
+    """'16x2,32x2' -> [(16, 2), (32, 2)]"""
+    configs = []
+    for part in spec.split(','):
+        bands, rows = part.lower().split('x')
+        configs.append((int(bands), int(rows)))
+    return configs
+
+
+def _result_key(result):
+    if not result:
+        return None
+    classification = result['classification']
+    return classification['L4'].get('id'), classification.get('L5', {}).get('keyword')
+
+
+def benchmark_lsh_recall(classifier, queries, configs, max_queries=500):
+    """
+    Compare LSH candidate generation against the exhaustive Stage 3 scan on
+    queries that miss the exact index: recall of keywords scoring >= 0.3,
+    agreement of the final classification, candidates scored and latency
+    """
+    saved = (classifier.lsh_bands, classifier.lsh_rows)
+    score = classifier._calculate_match_score
+    entries = classifier.keyword_entries
+
+    # Queries as Stage 3 sees them (normalized, typo-corrected, not exact hits)
+    stage3 = []
+    for query in queries:
+        query_norm = classifier._normalize(query)
+        query_words = set(query_norm.split())
+        corrected = classifier._correct_typos(query_norm, query_words)
+        if corrected:
+            query_norm, query_words = corrected, set(corrected.split())
+        if query_norm and query_norm not in classifier.keywords_index:
+            stage3.append((query, query_norm, query_words))
+        if len(stage3) >= max_queries:
+            break
+
+    matched = []
+    for _, query_norm, query_words in stage3:
+        matched.append({i for i, (keyword, keyword_words, _, _) in enumerate(entries)
+                        if score(query_norm, query_words, keyword, keyword_words) >= 0.3})
+
+    def timed_results():
+        results, timings = [], []
+        for query, _, _ in stage3:
+            t0 = time.perf_counter()
+            results.append(_result_key(classifier.classify_text(query)))
+            timings.append((time.perf_counter() - t0) * 1000)
+        return results, sum(timings) / len(timings) if timings else 0
+
+    classifier.build_lsh_index(0)
+    exhaustive_results, exhaustive_ms = timed_results()
+
+    report = {
+        'queries': len(stage3),
+        'keywords': len(entries),
+        'exhaustive_mean_ms': round(exhaustive_ms, 3),
+        'configs': []
+    }
+    for bands, rows in configs:
+        start = time.perf_counter()
+        classifier.build_lsh_index(bands, rows)
+        build_seconds = time.perf_counter() - start
+
+        found = total = candidates = 0
+        for (_, query_norm, query_words), relevant in zip(stage3, matched):
+            candidate_ids = classifier._lsh_candidate_ids(query_norm, query_words)
+            candidates += len(candidate_ids)
+            found += len(relevant & candidate_ids)
+            total += len(relevant)
+
+        results, mean_ms = timed_results()
+        agree = sum(a == b for a, b in zip(results, exhaustive_results))
+        report['configs'].append({
+            'bands': bands,
+            'rows': rows,
+            'build_seconds': round(build_seconds, 3),
+            'recall': round(found / total, 4) if total else 1.0,
+            'top1_agreement': round(agree / len(stage3), 4) if stage3 else 1.0,
+            'candidates_per_query': round(candidates / len(stage3), 1) if stage3 else 0,
+            'scanned_fraction': round(candidates / len(stage3) / len(entries), 4) if stage3 and entries else 0,
+            'mean_ms': round(mean_ms, 3),
+            'speedup': round(exhaustive_ms / mean_ms, 2) if mean_ms else 0
+        })
+
+    classifier.build_lsh_index(*saved)
+    return report
+
+
+def benchmark_import_times(modules=IMPORT_MODULES, repeat=5):
+    """
+    Wall time of `import <module>` in a fresh interpreter (best and median of repeat runs),
+    minus the bare interpreter start-up. Runs in a scratch directory so the app's
+    upload/results folders are not created in the repo.
+    """
+    repo_dir = os.path.dirname(os.path.abspath(__file__))
+    env = dict(os.environ, PYTHONPATH=repo_dir + os.pathsep + os.environ.get('PYTHONPATH', ''))
+
+    def cold_start(code):
+        times = []
+        with tempfile.TemporaryDirectory() as scratch:
+            for _ in range(repeat):
+                start = time.perf_counter()
+                subprocess.run([sys.executable, '-c', code], cwd=scratch, env=env, check=True,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+                times.append(time.perf_counter() - start)
+        return times
+
+    interpreter = min(cold_start('pass'))
+    results = {'interpreter_s': round(interpreter, 3), 'modules': {}}
+    for module in modules:
+        times = cold_start(f'import {module}')
+        results['modules'][module] = {
+            'best_s': round(min(times) - interpreter, 3),
+            'median_s': round(statistics.median(times) - interpreter, 3),
+        }
+    return results
+
+
+def print_import_report(import_times, baseline=None):
+    """Import-time table, with the change against a baseline report if given"""
+    previous = (baseline or {}).get('import_times', {}).get('modules', {})
+    print("\n⏱️  Cold import time (fresh interpreter, start-up "
+          f"{import_times['interpreter_s'] * 1000:.0f} ms excluded)")
+    for module, timing in import_times['modules'].items():
+        line = f"   {module:<22} best {timing['best_s'] * 1000:7.0f} ms   median {timing['median_s'] * 1000:7.0f} ms"
+        if module in previous:
+            line += f"   (was {previous[module]['best_s'] * 1000:.0f} ms)"
+        print(line)
+
+
+def benchmark_async_load(tree_path, queries, workers=2, concurrency=200):
+    """
+    Throughput and latency of AsyncClassifier (micro-batched) against sending every
+    request to the same kind of process pool on its own. `concurrency` clients each
+    send their share of the queries, one request at a time
+    """
+    from async_classifier import AsyncClassifier, classify_in_worker, create_worker_pool
+
+    async def run_clients(classify):
+        latencies = []
+
+        async def client(chunk):
+            for query in chunk:
+                start = time.perf_counter()
+                await classify(query)
+                latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(client(queries[i::concurrency]) for i in range(concurrency)))
+        elapsed = time.perf_counter() - start
+        latencies.sort()
+        return {
+            'qps': round(len(queries) / elapsed, 1),
+            'latency_ms': {p: round(percentile(latencies, p) * 1000, 2) for p in (50, 95, 99)}
+        }
+
+    async def per_request():
+        loop = asyncio.get_running_loop()
+        pool = create_worker_pool(tree_path, workers)
+        try:
+            await asyncio.gather(*(loop.run_in_executor(pool, classify_in_worker, []) for _ in range(workers)))
+            return await run_clients(lambda query: loop.run_in_executor(pool, classify_in_worker, [query]))
+        finally:
+            pool.shutdown()
+
+    async def micro_batched():
+        async with AsyncClassifier(tree_path, workers=workers) as classifier:
+            return await run_clients(classifier.classify)
+
+    return {
+        'queries': len(queries),
+        'workers': workers,
+        'concurrency': concurrency,
+        'per_request': asyncio.run(per_request()),
+        'micro_batched': asyncio.run(micro_batched())
+    }
+
+
+def print_async_report(load):
+    """Async load test table"""
+    print(f"\n⚡ Async load test ({load['queries']} queries, {load['workers']} workers, "
+          f"{load['concurrency']} concurrent clients)")
+    for mode in ('per_request', 'micro_batched'):
+        latency = load[mode]['latency_ms']
+        print(f"   {mode:<14} {load[mode]['qps']:9.1f} q/s   "
+              f"p50 {latency[50]:8.2f} ms   p95 {latency[95]:8.2f} ms   p99 {latency[99]:8.2f} ms")
+    print(f"   speedup        {load['micro_batched']['qps'] / load['per_request']['qps']:.1f}x")
+
+
+def run_benchmark(tree_path, sample_size=2000, batch_size=1000, seed=42, micro=False, lsh_configs=None):
+    """Run the full benchmark and return a JSON-serializable report"""
+    training_tree, held_out = split_taxonomy(tree_path, sample_size, seed)
+    labelled = build_labelled_set(held_out, seed)
+    queries = [item['query'] for item in labelled]
+
+    rss_before = peak_rss_mb()
+    with tempfile.TemporaryDirectory() as scratch:
+        training_path = os.path.join(scratch, 'training.json')
+        with open(training_path, 'w', encoding='utf-8') as f:
+            json.dump(training_tree, f)
+        del training_tree
+        start = time.perf_counter()
+        classifier = TelecomClassifier(training_path)
+        build_seconds = time.perf_counter() - start
+    rss_after_build = peak_rss_mb()
+
+    # Warm-up so one-off costs do not land in the first measured query
+    for query in queries[:20]:
+        classifier.classify_text(query)
+
+    # Single-query mode: time every call individually
+    latencies_ms = []
+    single_results = []
+    single_start = time.perf_counter()
+    for query in queries:
+        t0 = time.perf_counter()
+        single_results.append(classifier.classify_text(query))
+        latencies_ms.append((time.perf_counter() - t0) * 1000)
+    single_seconds = time.perf_counter() - single_start
+
+    # Batch mode
+    batch_start = time.perf_counter()
+    for i in range(0, len(queries), batch_size):
+        classifier.classify_batch(queries[i:i + batch_size])
+    batch_seconds = time.perf_counter() - batch_start
+
+    micro_results = run_micro_benchmarks(classifier, queries[:50]) if micro else None
+    lsh_results = benchmark_lsh_recall(classifier, queries, lsh_configs) if lsh_configs else None
+
+    latencies_ms.sort()
+    match_types = defaultdict(int)
+    for result in single_results:
+        match_types[result.get('match_type', 'unknown') if result else 'unclassified'] += 1
+
+    return {
+        'timestamp': datetime.now().isoformat(),
+        'commit': git_commit(),
+        'config': {
+            'tree': os.path.basename(tree_path),
+            'sample_size': sample_size,
+            'batch_size': batch_size,
+            'seed': seed,
+            'python': sys.version.split()[0]
+        },
+        'index': {
+            'keywords': len(classifier.keywords_index),
+            'held_out': len(held_out),
+            'build_seconds': round(build_seconds, 4),
+            'rss_delta_mb': round(rss_after_build - rss_before, 1)
+        },
+        'queries': len(queries),
+        'accuracy': measure_accuracy(labelled, single_results),
+        'match_types': dict(match_types),
+        'latency_ms': {
+            'p50': round(percentile(latencies_ms, 50), 4),
+            'p95': round(percentile(latencies_ms, 95), 4),
+            'p99': round(percentile(latencies_ms, 99), 4),
+            'max': round(latencies_ms[-1], 4) if latencies_ms else 0,
+            'mean': round(sum(latencies_ms) / len(latencies_ms), 4) if latencies_ms else 0
+        },
+        'throughput_qps': {
+            'single': round(len(queries) / single_seconds, 1) if single_seconds else 0,
+            'batch': round(len(queries) / batch_seconds, 1) if batch_seconds else 0
+        },
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+        'micro': micro_results,
+        'lsh': lsh_results
+    }
+
+
+def print_report(report, baseline=None):
+    """Print a human-readable summary, with deltas against a baseline report"""
+
+    def delta(path, fmt='{:+.1f}%', relative=True):
+        if not baseline:
+            return ''
+        old, new = baseline, report
+        for key in path:
+            old = old.get(key, {}) if isinstance(old, dict) else None
+            new = new.get(key, {}) if isinstance(new, dict) else None
+        if not isinstance(old, (int, float)) or not isinstance(new, (int, float)) or not old:
+            return ''
+        change = (new - old) / old * 100 if relative else (new - old)
+        return f"  ({fmt.format(change)} vs {baseline.get('commit') or 'baseline'})"
+
+    print("=" * 80)
+    print("TELECOM CLASSIFIER BENCHMARK")
+    print("=" * 80)
+    print(f"  Tree:            {report['config']['tree']} ({report['index']['keywords']:,} keywords indexed, "
+          f"{report['index'].get('held_out', 0):,} held out)")
+    print(f"  Commit:          {report['commit'] or 'unknown'}")
+    print(f"  Index build:     {report['index']['build_seconds']:.3f}s" + delta(('index', 'build_seconds')))
+    print(f"  Peak RSS:        {report['peak_rss_mb']:.1f} MB" + delta(('peak_rss_mb',)))
+    print(f"  Queries:         {report['queries']:,}")
+    print("-" * 80)
+    print(f"  Accuracy:        {report['accuracy']['overall'] * 100:.1f}% on held-out keywords"
+          + delta(('accuracy', 'overall'), '{:+.2f}', relative=False))
+    for variant, stats in report['accuracy']['per_variant'].items():
+        print(f"    {variant:14s} {stats['accuracy'] * 100:5.1f}%  ({stats['correct']}/{stats['total']})")
+    print("  Per L1:")
+    for l1, stats in report['accuracy']['per_l1'].items():
+        print(f"    {l1:25s} {stats['accuracy'] * 100:5.1f}%  ({stats['correct']}/{stats['total']})")
+    print("-" * 80)
+    for pct in ('p50', 'p95', 'p99'):
+        print(f"  Latency {pct}:     {report['latency_ms'][pct]:.3f} ms" + delta(('latency_ms', pct)))
+    print(f"  Single QPS:      {report['throughput_qps']['single']:,.1f}" + delta(('throughput_qps', 'single')))
+    print(f"  Batch QPS:       {report['throughput_qps']['batch']:,.1f}" + delta(('throughput_qps', 'batch')))
+    if report.get('micro'):
+        print("-" * 80)
+        print("  Micro-benchmarks:")
+        for name, stats in report['micro'].items():
+            print(f"    {name}: " + ', '.join(f"{k}={v}" for k, v in stats.items()))
+    if report.get('lsh'):
+        lsh = report['lsh']
+        print("-" * 80)
+        print(f"  LSH vs exhaustive scan ({lsh['queries']} non-exact queries, "
+              f"exhaustive {lsh['exhaustive_mean_ms']:.2f} ms/query):")
+        for stats in lsh['configs']:
+            print(f"    {stats['bands']:3d} bands x {stats['rows']} rows: recall {stats['recall'] * 100:5.1f}%  "
+                  f"top-1 agree {stats['top1_agreement'] * 100:5.1f}%  "
+                  f"scanned {stats['scanned_fraction'] * 100:4.1f}%  "
+                  f"{stats['mean_ms']:.2f} ms/query ({stats['speedup']:.1f}x)  build {stats['build_seconds']:.1f}s")
+    print("=" * 80)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Accuracy and latency benchmark for TelecomClassifier')
+    parser.add_argument('--tree', default=os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                       'telecom-classification-10K.json'),
+                        help='Path to the decision tree JSON')
+    parser.add_argument('--sample-size', type=int, default=2000, help='Number of L5 keywords to hold out and test')
+    parser.add_argument('--batch-size', type=int, default=1000, help='Queries per classify_batch call')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed for sampling and perturbation')
+    parser.add_argument('--output', default='bench_results.json', help='Where to write the JSON report')
+    parser.add_argument('--baseline', help='Previous JSON report to compare against')
+    parser.add_argument('--micro', action='store_true', help='Also run hot-path micro-benchmarks')
+    parser.add_argument('--lsh', metavar='BANDSxROWS,...',
+                        help='Measure LSH candidate recall/speed vs the exhaustive scan, e.g. 16x2,32x2,16x3')
+    parser.add_argument('--import-times', action='store_true',
+                        help='Only measure cold-start import time of the app and CLI modules')
+    parser.add_argument('--async-load', action='store_true',
+                        help='Only run the async load test (micro-batched vs per-request dispatch)')
+    parser.add_argument('--workers', type=int, default=2, help='Process pool size for --async-load')
+    parser.add_argument('--concurrency', type=int, default=200, help='Concurrent clients for --async-load')
+    args = parser.parse_args()
+
+    baseline = None
+    if args.baseline and os.path.exists(args.baseline):
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)
+
+    if args.import_times:
+        report = {'timestamp': datetime.now().isoformat(), 'commit': git_commit(),
+                  'import_times': benchmark_import_times()}
+        print_import_report(report['import_times'], baseline)
+    elif args.async_load:
+        queries = [item['query'] for item in
+                   build_labelled_set(split_taxonomy(args.tree, args.sample_size, args.seed)[1], args.seed)]
+        report = {'timestamp': datetime.now().isoformat(), 'commit': git_commit(), 'tree': args.tree,
+                  'async_load': benchmark_async_load(args.tree, queries, args.workers, args.concurrency)}
+        print_async_report(report['async_load'])
+    else:
+        lsh_configs = parse_lsh_configs(args.lsh) if args.lsh else None
+        report = run_benchmark(args.tree, args.sample_size, args.batch_size, args.seed, args.micro, lsh_configs)
+        print_report(report, baseline)
+
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\n💾 Results saved to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,363 @@
+#!/usr/bin/env python3
+"""
+Export Classification Results
+Typed, columnar copies of results files (results_*.csv) for downstream jobs:
+
+- Parquet (zstd) or Arrow IPC, with dtypes kept (scores, confidence, classified flag)
+- Label columns (topic, L1/L2, intent, funnel stage) dictionary-encoded
+- Excel workbooks streamed in write-only mode, split at the sheet row limit
+- ExportCache: built artifacts keyed by results-file content hash + format
+
+Usage:
+    python3 export_results.py results/results_20250101_120000.csv
+    python3 export_results.py results/results_*.csv --format both --output-dir exports/
+    python3 export_results.py results/results_*.csv --format excel
+"""
+
+import argparse
+import glob
+import hashlib
+import importlib.util
+import os
+import threading
+import time
+from collections import Counter
+
+import metrics
+
+# pandas and openpyxl are imported inside the functions that use them, so
+# importing this module (e.g. from the app) stays cheap
+
+# Classification labels repeat across rows - stored as categories (Arrow dictionaries)
+LABEL_COLUMNS = ['topical_group', 'L1_category', 'L2_subcategory', 'L3_intent', 'L3_intent_sub', 'funnel_stage']
+NUMERIC_COLUMNS = ['original_index', 'commercial_score', 'confidence_score']
+
+# format -> (file extension, mimetype)
+COLUMNAR_FORMATS = {
+    'parquet': ('.parquet', 'application/vnd.apache.parquet'),
+    'arrow': ('.arrow', 'application/vnd.apache.arrow.file'),
+}
+
+# Every export served by the app: format -> (file suffix, mimetype)
+EXPORT_FORMATS = {
+    'excel': ('.xlsx', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+    'grouped-csv': ('_grouped.csv', 'text/csv'),
+    **COLUMNAR_FORMATS,
+}
+GROUPED_SORT_COLUMNS = ['L1_category', 'L2_subcategory', 'topical_group', 'query']
+
+# Rows per worksheet in .xlsx (header included); longer data continues on a new sheet
+EXCEL_MAX_ROWS = 1048576
+EXCEL_CHUNK_SIZE = 50000
+# Summary sheets: sheet name -> column counted
+EXCEL_SUMMARY_SHEETS = [('Topics Summary', 'topical_group'), ('L1 Categories', 'L1_category')]
+
+EXPORT_CACHE_LOOKUPS = metrics.Counter('export_cache_lookups_total',
+                                       'Export artifact requests, by format and result (hit or miss)',
+                                       ['format', 'result'])
+
+
+def columnar_export_available():
+    """Parquet and Arrow output need the optional pyarrow package"""
+    return importlib.util.find_spec('pyarrow') is not None
+
+
+def load_results(csv_path):
+    """Read a results CSV with the classification columns typed"""
+    import pandas as pd
+
+    df = pd.read_csv(csv_path)
+    for column in NUMERIC_COLUMNS:
+        if column in df.columns:
+            df[column] = pd.to_numeric(df[column], errors='coerce')
+    if 'classified' in df.columns:
+        df['classified'] = df['classified'].astype(str).str.lower().eq('true')
+    if 'query' in df.columns:
+        df['query'] = df['query'].astype('string')
+    for column in LABEL_COLUMNS:
+        if column in df.columns:
+            df[column] = df[column].astype('category')
+    return df
+
+
+def write_columnar(df, output_path, fmt):
+    """Write df as Parquet or Arrow IPC (both zstd-compressed)"""
+    if fmt == 'parquet':
+        df.to_parquet(output_path, engine='pyarrow', compression='zstd', index=False)
+    elif fmt == 'arrow':
+        df.reset_index(drop=True).to_feather(output_path, compression='zstd')
+    else:
+        raise ValueError(f"Unknown columnar format: {fmt}")
+    return output_path
+
+
+def convert_results_file(csv_path, fmt, output_dir=None):
+    """Convert one results CSV; returns the path of the written file"""
+    extension, _ = COLUMNAR_FORMATS[fmt]
+    base_name = os.path.splitext(os.path.basename(csv_path))[0]
+    output_path = os.path.join(output_dir or os.path.dirname(csv_path), base_name + extension)
+    return write_columnar(load_results(csv_path), output_path, fmt)
+
+
+def _header_row(sheet, columns):
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Font
+
+    cells = []
+    for column in columns:
+        cell = WriteOnlyCell(sheet, value=str(column))
+        cell.font = Font(bold=True)
+        cells.append(cell)
+    return cells
+
+
+def write_results_excel(csv_path, output_path, chunk_size=EXCEL_CHUNK_SIZE, max_rows=EXCEL_MAX_ROWS):
+    """
+    Stream a results CSV into an .xlsx workbook without holding it in memory
+    - 'All Data' written chunk by chunk in openpyxl write-only mode, continuing
+      on 'All Data (2)', ... when a sheet reaches max_rows
+    - 'Topics Summary' / 'L1 Categories' counts accumulated during the same pass
+    """
+    import pandas as pd
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    counts = {column: Counter() for _, column in EXCEL_SUMMARY_SHEETS}
+    sheet = None
+    sheet_rows = 0
+    sheet_count = 0
+    columns = None
+
+    for chunk in pd.read_csv(csv_path, chunksize=chunk_size):
+        if columns is None:
+            columns = list(chunk.columns)
+        for column, counter in counts.items():
+            if column in chunk.columns:
+                counter.update(chunk[column].value_counts().to_dict())
+
+        rows = chunk.astype(object).where(chunk.notna(), None).itertuples(index=False, name=None)
+        for row in rows:
+            if sheet is None or sheet_rows >= max_rows:
+                sheet_count += 1
+                sheet = workbook.create_sheet('All Data' if sheet_count == 1 else f'All Data ({sheet_count})')
+                sheet.append(_header_row(sheet, columns))
+                sheet_rows = 1
+            sheet.append(row)
+            sheet_rows += 1
+
+    if sheet is None:
+        # Empty results file - still produce the data sheet with its header
+        sheet = workbook.create_sheet('All Data')
+        sheet.append(_header_row(sheet, columns or []))
+
+    for sheet_name, column in EXCEL_SUMMARY_SHEETS:
+        if columns is None or column not in columns:
+            continue
+        summary = workbook.create_sheet(sheet_name)
+        summary.append(_header_row(summary, [column, 'count']))
+        for value, count in sorted(counts[column].items(), key=lambda item: (-item[1], str(item[0]))):
+            summary.append([value, int(count)])
+
+    workbook.save(output_path)
+    return output_path
+
+
+def write_grouped_csv(csv_path, output_path):
+    """Results sorted by L1 > L2 > topical group > query"""
+    import pandas as pd
+
+    df = pd.read_csv(csv_path)
+    df.sort_values(GROUPED_SORT_COLUMNS).to_csv(output_path, index=False)
+    return output_path
+
+
+def build_export(csv_path, fmt, output_path):
+    """Write the fmt export of one results CSV to output_path"""
+    if fmt == 'excel':
+        return write_results_excel(csv_path, output_path)
+    if fmt == 'grouped-csv':
+        return write_grouped_csv(csv_path, output_path)
+    if fmt in COLUMNAR_FORMATS:
+        return write_columnar(load_results(csv_path), output_path, fmt)
+    raise ValueError(f"Unknown export format: {fmt}")
+
+
+class ExportCache:
+    """
+    Built export artifacts keyed by results-file content hash + format
+
+    - A results file is re-hashed only when its size or mtime changes
+    - Concurrent requests for the same artifact wait on a single build
+    - Artifacts are written to a temp file and renamed, so readers (and other
+      worker processes) never see a partial file
+    - Artifacts older than max_age seconds are rebuilt/removed; past max_bytes
+      the least recently served ones are removed first
+    - Artifacts served or built in the last IN_USE_SECONDS are never evicted, so
+      a path handed to send_file is not removed by another worker's eviction
+      before it is opened
+    """
+
+    HASH_BLOCK_SIZE = 1024 * 1024
+    TEMP_PREFIX = '.tmp-'
+    IN_USE_SECONDS = 60
+    # Remembered results-file digests; past this, those of deleted files are dropped
+    MAX_DIGESTS = 1024
+
+    def __init__(self, cache_dir, max_bytes=2 * 1024 ** 3, max_age=7 * 24 * 3600):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._builds = {}   # artifact path -> lock held while it is being built
+        self._digests = {}  # results path -> ((size, mtime_ns), sha256)
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def content_hash(self, path):
+        """sha256 of a file, remembered until its size or mtime changes"""
+        stat = os.stat(path)
+        signature = (stat.st_size, stat.st_mtime_ns)
+        cached = self._digests.get(path)
+        if cached and cached[0] == signature:
+            return cached[1]
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(self.HASH_BLOCK_SIZE), b''):
+                digest.update(block)
+        if len(self._digests) >= self.MAX_DIGESTS:
+            self._digests = {known: entry for known, entry in self._digests.items() if os.path.exists(known)}
+            if len(self._digests) >= self.MAX_DIGESTS:
+                self._digests.clear()
+        self._digests[path] = (signature, digest.hexdigest())
+        return digest.hexdigest()
+
+    def _is_fresh(self, artifact, now):
+        try:
+            return now - os.stat(artifact).st_mtime < self.max_age
+        except FileNotFoundError:
+            return False
+
+    def _serve_hit(self, artifact, now):
+        """
+        Record a hit in atime (LRU order) if artifact is fresh - mtime stays the
+        build time for Last-Modified. False when it is stale or another worker
+        just evicted it
+        """
+        try:
+            mtime = os.stat(artifact).st_mtime
+            if now - mtime >= self.max_age:
+                return False
+            os.utime(artifact, (now, mtime))
+            return True
+        except FileNotFoundError:
+            return False
+
+    def get(self, csv_path, fmt):
+        """
+        (artifact path, etag) of the fmt export of csv_path, built on a miss
+        The etag names the source content and format, so it is stable across
+        rebuilds and processes
+        """
+        extension, _ = EXPORT_FORMATS[fmt]
+        digest = self.content_hash(csv_path)[:32]
+        etag = f"{digest}-{fmt}"
+        # Suffixes differ per format, so the digest alone keeps artifacts apart
+        artifact = os.path.join(self.cache_dir, digest + extension)
+
+        now = time.time()
+        if self._serve_hit(artifact, now):
+            EXPORT_CACHE_LOOKUPS.labels(fmt, 'hit').inc()
+        else:
+            EXPORT_CACHE_LOOKUPS.labels(fmt, 'miss').inc()
+            with self._lock:
+                build_lock = self._builds.setdefault(artifact, threading.Lock())
+            with build_lock:
+                # Another request may have finished the build while we waited
+                if not self._is_fresh(artifact, time.time()):
+                    temp_path = os.path.join(
+                        self.cache_dir, f"{self.TEMP_PREFIX}{os.getpid()}-{threading.get_ident()}-{digest}{extension}")
+                    try:
+                        build_export(csv_path, fmt, temp_path)
+                        os.replace(temp_path, artifact)
+                    finally:
+                        if os.path.exists(temp_path):
+                            os.remove(temp_path)
+            with self._lock:
+                self._builds.pop(artifact, None)
+            self.evict(keep=artifact)
+
+        return artifact, etag
+
+    def evict(self, keep=None):
+        """
+        Remove expired artifacts, then least recently served ones until under max_bytes
+        Other workers may be evicting at the same time: files they removed first are skipped
+        """
+        now = time.time()
+        entries = []
+        for entry in os.scandir(self.cache_dir):
+            try:
+                if not entry.is_file():
+                    continue
+                stat = entry.stat()
+                if entry.name.startswith(self.TEMP_PREFIX):
+                    # Leftover from a crashed build
+                    if now - stat.st_mtime >= self.max_age:
+                        os.remove(entry.path)
+                    continue
+                last_used = max(stat.st_atime, stat.st_mtime)
+                in_use = entry.path == keep or now - last_used < self.IN_USE_SECONDS
+                if not in_use and now - stat.st_mtime >= self.max_age:
+                    os.remove(entry.path)
+                    continue
+            except FileNotFoundError:
+                continue
+            entries.append((last_used, stat.st_size, entry.path, in_use))
+
+        total = sum(size for _, size, _, _ in entries)
+        for _, size, path, in_use in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if in_use:
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Convert results_*.csv files to Parquet / Arrow IPC / Excel')
+    parser.add_argument('paths', nargs='+', help='Results CSV files (glob patterns allowed)')
+    parser.add_argument('--format', choices=['parquet', 'arrow', 'both', 'excel'], default='parquet',
+                        help='Output format (default: parquet; both = parquet + arrow)')
+    parser.add_argument('--output-dir', help='Write outputs here instead of next to each CSV')
+    args = parser.parse_args()
+
+    if args.format != 'excel' and not columnar_export_available():
+        parser.error('Parquet/Arrow export requires pyarrow: pip install pyarrow')
+
+    formats = ['parquet', 'arrow'] if args.format == 'both' else [args.format]
+    paths = sorted({path for pattern in args.paths for path in (glob.glob(pattern) or [pattern])})
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+
+    for csv_path in paths:
+        if not os.path.exists(csv_path):
+            print(f"✗ Not found: {csv_path}")
+            continue
+        csv_size = os.path.getsize(csv_path)
+        for fmt in formats:
+            if fmt == 'excel':
+                base_name = os.path.splitext(os.path.basename(csv_path))[0]
+                output_path = write_results_excel(
+                    csv_path, os.path.join(args.output_dir or os.path.dirname(csv_path), base_name + '.xlsx'))
+            else:
+                output_path = convert_results_file(csv_path, fmt, args.output_dir)
+            size = os.path.getsize(output_path)
+            print(f"✓ {csv_path} ({csv_size / 1e6:.1f} MB) -> {output_path} "
+                  f"({size / 1e6:.1f} MB, {csv_size / size:.1f}x smaller)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+Fuzzy Candidate Indexes
+Approximate-match indexes built once at classifier load time
+"""
+
+import random
+import zlib
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+def bounded_edit_distance(a: str, b: str, max_distance: int) -> int:
+    """
+    Optimal string alignment distance (Levenshtein plus adjacent transpositions)
+    Returns max_distance + 1 as soon as the distance is known to exceed the bound
+    """
+    if a == b:
+        return 0
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+
+    # Shared prefix and suffix never add edits - only align what differs
+    start = 0
+    shortest = min(len(a), len(b))
+    while start < shortest and a[start] == b[start]:
+        start += 1
+    end = 0
+    while end < shortest - start and a[-1 - end] == b[-1 - end]:
+        end += 1
+    a = a[start:len(a) - end]
+    b = b[start:len(b) - end]
+    len_a, len_b = len(a), len(b)
+    if not len_a or not len_b:
+        return max(len_a, len_b)
+    if max_distance == 1:
+        # One edit leaves a single differing character or a swapped pair
+        if (len_a == 1 and len_b == 1) or (len_a == 2 and len_b == 2 and a == b[::-1]):
+            return 1
+        return 2
+
+    # Only cells within max_distance of the diagonal can stay under the bound
+    over = max_distance + 1
+    previous_previous = None
+    previous = [j if j <= max_distance else over for j in range(len_b + 1)]
+    for i in range(1, len_a + 1):
+        current = [over] * (len_b + 1)
+        if i <= max_distance:
+            current[0] = i
+        row_min = current[0]
+        char_a = a[i - 1]
+        for j in range(max(1, i - max_distance), min(len_b, i + max_distance) + 1):
+            char_b = b[j - 1]
+            if char_a == char_b:
+                value = previous[j - 1]
+            else:
+                value = min(previous[j], current[j - 1], previous[j - 1]) + 1
+                if (j > 1 and i > 1 and char_a == b[j - 2] and a[i - 2] == char_b
+                        and previous_previous[j - 2] + 1 < value):
+                    value = previous_previous[j - 2] + 1
+            if value > over:
+                value = over
+            current[j] = value
+            if value < row_min:
+                row_min = value
+        if row_min > max_distance:
+            return over
+        previous_previous, previous = previous, current
+
+    return previous[len_b]
+
+
+class SymSpellIndex:
+    """
+    Typo-tolerant token lookup (SymSpell deletion dictionary)
+
+    Every vocabulary token is indexed under all strings reachable by deleting
+    up to max_edit_distance characters. A misspelled token generates its own
+    deletions; any vocabulary token sharing one is a candidate, and the closest
+    (then most frequent) candidate within the length-dependent bound wins.
+    Only the first PREFIX_LENGTH characters are expanded into deletions, which
+    keeps long tokens cheap; candidates are always verified on the full token.
+    """
+
+    # Tokens shorter than this are never corrected (too many near neighbours)
+    MIN_TOKEN_LENGTH = 4
+    # Tokens at least this long may be corrected at the full edit distance;
+    # shorter ones allow a single edit
+    LONG_TOKEN_LENGTH = 8
+    PREFIX_LENGTH = 7
+    MAX_CACHE_SIZE = 50000
+
+    def __init__(self, token_counts: Dict[str, int], max_edit_distance: int = 2):
+        self.max_edit_distance = max_edit_distance
+        self.vocabulary = frozenset(token_counts)
+        self.token_counts = dict(token_counts)
+        self.deletes = {}
+        self._cache = {}
+
+        for token in self.token_counts:
+            if len(token) < self.MIN_TOKEN_LENGTH - 1 or not token.isalpha():
+                continue
+            for variant in self._deletions(token[:self.PREFIX_LENGTH], max_edit_distance):
+                self.deletes.setdefault(variant, []).append(token)
+
+    @staticmethod
+    def _deletions(token: str, max_distance: int) -> set:
+        """All strings reachable from token by deleting up to max_distance characters"""
+        results = {token}
+        frontier = {token}
+        for _ in range(max_distance):
+            next_frontier = {word[:i] + word[i + 1:] for word in frontier if len(word) > 1
+                             for i in range(len(word))}
+            next_frontier -= results
+            results |= next_frontier
+            frontier = next_frontier
+        return results
+
+    def max_distance_for(self, token: str) -> int:
+        """Edit distance allowed when correcting token"""
+        if len(token) < self.MIN_TOKEN_LENGTH or not token.isalpha():
+            return 0
+        if len(token) < self.LONG_TOKEN_LENGTH:
+            return min(1, self.max_edit_distance)
+        return self.max_edit_distance
+
+    def correct(self, token: str) -> Optional[str]:
+        """
+        Return the closest vocabulary token for an unknown token,
+        the token itself if it is already known, or None if nothing is close enough
+        """
+        if token in self.vocabulary:
+            return token
+        if token in self._cache:
+            return self._cache[token]
+
+        max_distance = self.max_distance_for(token)
+        best = None
+        if max_distance:
+            best_key = None
+            seen = set()
+            for variant in self._deletions(token[:self.PREFIX_LENGTH], max_distance):
+                for candidate in self.deletes.get(variant, ()):
+                    if candidate in seen:
+                        continue
+                    seen.add(candidate)
+                    distance = bounded_edit_distance(token, candidate, max_distance)
+                    if distance > max_distance:
+                        continue
+                    key = (distance, -self.token_counts[candidate], candidate)
+                    if best_key is None or key < best_key:
+                        best_key = key
+                        best = candidate
+
+        if len(self._cache) >= self.MAX_CACHE_SIZE:
+            self._cache.clear()
+        self._cache[token] = best
+        return best
+
+    def correct_tokens(self, tokens: Iterable[str]) -> list:
+        """Correct each token, keeping tokens that have no close vocabulary match"""
+        return [self.correct(token) or token for token in tokens]
+
+
+class MinHashLSHIndex:
+    """
+    Candidate generation by MinHash locality-sensitive hashing over token sets
+
+    Each token set gets a signature of bands * rows MinHash values; sets that
+    agree on every value of at least one band land in the same bucket. A pair
+    with Jaccard similarity s becomes a candidate with probability
+    1 - (1 - s**rows) ** bands, so more bands raise recall and more rows
+    prune harder (faster, lower recall).
+    """
+
+    _PRIME = (1 << 61) - 1
+
+    def __init__(self, token_sets: List[frozenset], bands: int = 16, rows: int = 2, seed: int = 1):
+        self.bands = bands
+        self.rows = rows
+        rnd = random.Random(seed)
+        self._coefficients = [(rnd.randrange(1, self._PRIME), rnd.randrange(self._PRIME))
+                              for _ in range(bands * rows)]
+        # Indexed tokens are hashed once; query-only tokens are hashed on demand
+        self._token_signatures = {token: self._hash_token(token)
+                                  for token in set().union(*token_sets)}
+        self.tables = [{} for _ in range(bands)]
+
+        for entry_id, tokens in enumerate(token_sets):
+            if not tokens:
+                continue
+            for table, key in zip(self.tables, self._band_keys(tokens)):
+                bucket = table.get(key)
+                if bucket is None:
+                    table[key] = [entry_id]
+                else:
+                    bucket.append(entry_id)
+
+    def _hash_token(self, token: str) -> tuple:
+        """One universal hash per signature slot (crc32 keeps it stable across runs)"""
+        x = zlib.crc32(token.encode('utf-8'))
+        prime = self._PRIME
+        return tuple((a * x + b) % prime for a, b in self._coefficients)
+
+    def signature(self, tokens: Iterable[str]) -> List[int]:
+        """MinHash signature of a token set"""
+        known = self._token_signatures
+        vectors = [known.get(token) or self._hash_token(token) for token in tokens]
+        if len(vectors) == 1:
+            return list(vectors[0])
+        return list(map(min, *vectors))
+
+    def _band_keys(self, tokens: Iterable[str]) -> List[int]:
+        signature = self.signature(tokens)
+        rows = self.rows
+        return [hash(tuple(signature[band * rows:(band + 1) * rows])) for band in range(self.bands)]
+
+    def query(self, tokens: Iterable[str]) -> set:
+        """Ids of indexed token sets sharing at least one band with tokens"""
+        candidates = set()
+        if not tokens:
+            return candidates
+        for table, key in zip(self.tables, self._band_keys(tokens)):
+            bucket = table.get(key)
+            if bucket:
+                candidates.update(bucket)
+        return candidates
+
+
+class TfidfTopicIndex:
+    """
+    Nearest-topic lookup over character n-gram TF-IDF vectors
+
+    Each document (one per L4 topic: its name plus its L5 keywords) becomes an
+    L2-normalized sparse vector, so cosine similarity is a dot product. Queries
+    are projected in chunks and matched against every topic with one sparse
+    matrix multiply per chunk, which bounds memory to chunk_size x topics.
+    """
+
+    def __init__(self, documents: List[str], ngram_range: Tuple[int, int] = (2, 4), chunk_size: int = 256):
+        # Optional and slow to import - only loaded when the fallback is enabled
+        try:
+            from sklearn.feature_extraction.text import TfidfVectorizer
+        except ImportError:
+            raise ImportError("The TF-IDF fallback needs scikit-learn: pip install scikit-learn") from None
+        self.chunk_size = chunk_size
+        self.vectorizer = TfidfVectorizer(analyzer='char_wb', ngram_range=ngram_range, sublinear_tf=True)
+        # Stored as features x topics so a chunk of query rows multiplies directly
+        self.matrix = self.vectorizer.fit_transform(documents).T.tocsr()
+
+    def nearest(self, texts: List[str]) -> List[Optional[Tuple[int, float]]]:
+        """(document index, cosine similarity) of the closest document per text, None if nothing overlaps"""
+        results = []
+        for start in range(0, len(texts), self.chunk_size):
+            similarities = self.vectorizer.transform(texts[start:start + self.chunk_size]) @ self.matrix
+            best = similarities.argmax(axis=1).A1
+            scores = similarities.max(axis=1).toarray().ravel()
+            for document, score in zip(best, scores):
+                results.append((int(document), float(score)) if score > 0 else None)
+        return results
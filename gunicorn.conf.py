@@ -0,0 +1,72 @@
+"""
+Gunicorn production profile
+
+    pip install gunicorn
+    gunicorn -c gunicorn.conf.py app:app
+
+The app module is imported once in the master (preload_app) and when_ready loads
+the classifier there, so the decision tree is parsed and the indexes are built
+before the workers fork. Workers share those pages copy-on-write instead of each
+loading the taxonomy. GET /api/ready answers 200 only once the classifier is loaded.
+
+GET /metrics adds up the values of all workers: each process writes its own to
+METRICS_DIR, and the master folds the file of every exited worker into one
+retired.json. METRICS_DIR defaults to a fresh temporary directory per server,
+removed on shutdown; one set in the environment should start out empty.
+
+Environment overrides: BIND, WEB_CONCURRENCY (workers), GUNICORN_THREADS, GUNICORN_TIMEOUT, METRICS_DIR
+"""
+
+import gc
+import multiprocessing
+import os
+import shutil
+import tempfile
+
+# Read by the app when it is imported; this file runs in the master before that
+default_metrics_dir = os.path.join(tempfile.gettempdir(), f'telecom-classifier-metrics-{os.getpid()}')
+metrics_dir = os.environ.setdefault('METRICS_DIR', default_metrics_dir)
+
+bind = os.environ.get('BIND', '0.0.0.0:5001')
+workers = int(os.environ.get('WEB_CONCURRENCY', min(multiprocessing.cpu_count() * 2 + 1, 8)))
+# Threads let a worker keep serving /api/* while another request classifies an upload
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+preload_app = True
+
+# Large uploads classify for minutes; stalled clients are still cut off
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 600))
+graceful_timeout = 30
+keepalive = 5
+
+accesslog = '-'
+errorlog = '-'
+
+
+def when_ready(server):
+    # Importing app no longer loads the classifier; do it once here, before the first fork
+    import app
+    app.warm_up()
+
+
+def pre_fork(server, worker):
+    # Everything the preloaded app allocated goes to the permanent GC generation:
+    # collections in the workers then never write to (and un-share) those pages
+    gc.freeze()
+
+
+def worker_exit(server, worker):
+    # In the worker: counts since the last periodic write
+    import metrics
+    metrics.flush()
+
+
+def child_exit(server, worker):
+    # In the master, once the worker is gone: its totals move into retired.json
+    import metrics
+    metrics.retire(metrics_dir, worker.pid)
+
+
+def on_exit(server):
+    if metrics_dir == default_metrics_dir:
+        shutil.rmtree(metrics_dir, ignore_errors=True)
@@ -0,0 +1,349 @@
+#!/usr/bin/env python3
+"""
+Prometheus Metrics
+Counters and histograms kept in process and rendered in the Prometheus text
+exposition format, served by the app at GET /metrics - no client library and
+no separate metrics server:
+
+    UPLOADS = Counter('uploads_total', 'Uploads handled, by outcome', ['result'])
+    UPLOADS.labels('reused').inc()
+    READ_SECONDS = Histogram('upload_read_seconds', 'Time to read and parse an upload')
+    READ_SECONDS.observe(elapsed)
+
+Under a pre-forking server every worker counts only its own requests. When
+configure() is given a directory (the app does so from METRICS_DIR, which
+gunicorn.conf.py sets), each process writes its values there about once a
+second and render() adds up the files of all processes, so any worker's
+/metrics reports the whole server. When a worker exits, the master folds its
+file into retired.json (retire()), which keeps its counts and bounds the
+directory by the number of live processes.
+"""
+
+import json
+import os
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Sequence, Tuple
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+# Seconds, from a cached classification to a large upload
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                   0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+FLUSH_INTERVAL = 1.0
+# Totals of exited processes, folded in by retire()
+RETIRED_FILE = 'retired.json'
+
+# Every metric, in definition order (the order render() lists them)
+_registry = []
+# Guards all values; replaced in forked children in case another thread held it
+_lock = threading.Lock()
+_directory = None
+# This process's file in _directory
+_process_file = None
+_last_written = None
+
+
+class _CounterChild:
+    __slots__ = ('value',)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1):
+        with _lock:
+            self.value += amount
+
+    def _reset(self):
+        self.value = 0.0
+
+    def _state(self):
+        return self.value
+
+
+class _HistogramChild:
+    __slots__ = ('upper_bounds', 'counts', 'sum')
+
+    def __init__(self, upper_bounds: Tuple[float, ...]):
+        self.upper_bounds = upper_bounds
+        # Per bucket (not cumulative); the last one is +Inf
+        self.counts = [0] * (len(upper_bounds) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        index = bisect_left(self.upper_bounds, value)
+        with _lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    @contextmanager
+    def time(self):
+        """Observe the seconds spent in the with block"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+    def _reset(self):
+        self.counts = [0] * (len(self.upper_bounds) + 1)
+        self.sum = 0.0
+
+    def _state(self):
+        return self.counts + [self.sum]
+
+
+class _Metric:
+    type = None
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        if not self.labelnames:
+            self._default = self.labels()
+        _registry.append(self)
+
+    def labels(self, *values):
+        """The series for these label values (look it up once and keep it on hot paths)"""
+        key = tuple(str(value) for value in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name} takes labels {self.labelnames}, got {values}")
+            with _lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """Monotonic total (name it *_total)"""
+
+    type = 'counter'
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1):
+        self._default.inc(amount)
+
+    def _samples(self, labels: str, state) -> List[str]:
+        return [f"{self.name}{_braces(labels)} {_format(state)}"]
+
+
+class Histogram(_Metric):
+    """Distribution over fixed buckets (cumulative le buckets, _sum and _count when rendered)"""
+
+    type = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.upper_bounds = tuple(sorted(float(bound) for bound in buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramChild(self.upper_bounds)
+
+    def observe(self, value: float):
+        self._default.observe(value)
+
+    def time(self):
+        return self._default.time()
+
+    def _samples(self, labels: str, state) -> List[str]:
+        separator = ',' if labels else ''
+        samples = []
+        cumulative = 0
+        for bound, count in zip(self.upper_bounds + (float('inf'),), state):
+            cumulative += count
+            samples.append(f'{self.name}_bucket{{{labels}{separator}le="{_format(bound)}"}} {cumulative}')
+        samples.append(f"{self.name}_sum{_braces(labels)} {_format(state[-1])}")
+        samples.append(f"{self.name}_count{_braces(labels)} {cumulative}")
+        return samples
+
+
+def _format(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value))
+
+
+def _braces(labels: str) -> str:
+    return '{' + labels + '}' if labels else ''
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _snapshot() -> Dict[str, Dict[str, list]]:
+    """name -> JSON-encoded label values -> state, for this process"""
+    with _lock:
+        return {metric.name: {json.dumps(key): child._state() for key, child in metric._children.items()}
+                for metric in _registry}
+
+
+def _add(total, state):
+    if isinstance(total, list):
+        return [a + b for a, b in zip(total, state)]
+    return total + state
+
+
+def _merge(target: Dict[str, Dict[str, list]], values: Dict[str, Dict[str, list]]):
+    """Add values into target (name -> JSON-encoded label values -> state)"""
+    for name, series in values.items():
+        totals = target.setdefault(name, {})
+        for key, state in series.items():
+            totals[key] = _add(totals[key], state) if key in totals else state
+
+
+def _read_json(path: str):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _stamp(path: str):
+    """Changes whenever the file is replaced (os.replace gives it a new inode)"""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_ino, stat.st_mtime_ns
+
+
+def _collect() -> Dict[str, Dict[str, list]]:
+    """This process's values plus, when configured, those every other process wrote"""
+    merged = _snapshot()
+    if _directory is None:
+        return merged
+    retired_path = os.path.join(_directory, RETIRED_FILE)
+    # retire() writes the retired file before removing the files it folded in;
+    # if it ran while we read, read again so nothing is counted twice or dropped
+    for _ in range(3):
+        stamp = _stamp(retired_path)
+        retired = _read_json(retired_path) or {'folded': [], 'metrics': {}}
+        skip = {_process_file, RETIRED_FILE, *retired['folded']}
+        others = [_read_json(entry.path) for entry in os.scandir(_directory)
+                  if entry.name.endswith('.json') and entry.name not in skip]
+        if _stamp(retired_path) == stamp:
+            break
+    _merge(merged, retired['metrics'])
+    for other in others:
+        if other is not None:
+            _merge(merged, other)
+    return merged
+
+
+def render() -> str:
+    """All metrics in the Prometheus text exposition format"""
+    merged = _collect()
+    lines = []
+    for metric in _registry:
+        lines.append(f"# HELP {metric.name} {metric.documentation}")
+        lines.append(f"# TYPE {metric.name} {metric.type}")
+        for key, state in sorted(merged.get(metric.name, {}).items()):
+            labels = ','.join(f'{name}="{_escape(value)}"'
+                              for name, value in zip(metric.labelnames, json.loads(key)))
+            lines.extend(metric._samples(labels, state))
+    return '\n'.join(lines) + '\n'
+
+
+def _write_json(path: str, data: str):
+    temp_path = path + '.tmp'
+    with open(temp_path, 'w') as f:
+        f.write(data)
+    # Readers never see a partial file
+    os.replace(temp_path, path)
+
+
+def flush():
+    """Write this process's values to its file in the configured directory (if they changed)"""
+    global _last_written
+    if _directory is None:
+        return
+    data = json.dumps(_snapshot())
+    if data == _last_written:
+        return
+    _write_json(os.path.join(_directory, _process_file), data)
+    _last_written = data
+
+
+def retire(directory: str, pid: int):
+    """
+    Fold the files of exited process pid into the retired totals of directory
+    Keeps an exited worker's counts without keeping its file. Call from one
+    process only (the gunicorn master, in child_exit).
+    """
+    folded = [entry.name for entry in os.scandir(directory)
+              if entry.name.startswith(f"{pid}-") and entry.name.endswith('.json')]
+    if not folded:
+        return
+    retired_path = os.path.join(directory, RETIRED_FILE)
+    totals = (_read_json(retired_path) or {'metrics': {}})['metrics']
+    for name in folded:
+        values = _read_json(os.path.join(directory, name))
+        if values is not None:
+            _merge(totals, values)
+    # Readers skip the folded files from the moment the retired file lists them
+    _write_json(retired_path, json.dumps({'folded': folded, 'metrics': totals}))
+    for name in folded:
+        try:
+            os.remove(os.path.join(directory, name))
+        except FileNotFoundError:
+            pass
+
+
+def _flush_loop():
+    while True:
+        time.sleep(FLUSH_INTERVAL)
+        try:
+            flush()
+        except OSError:
+            pass
+
+
+def _start_flusher():
+    threading.Thread(target=_flush_loop, name='metrics-flush', daemon=True).start()
+
+
+def _new_process_file() -> str:
+    """pid plus a random part: a later process reusing the pid never takes over this file"""
+    return f"{os.getpid()}-{uuid.uuid4().hex[:12]}.json"
+
+
+def configure(directory: Optional[str]):
+    """
+    Share values between processes through files in directory (None: this process only)
+    From then on every process forked from this one - pool workers included -
+    starts from zero and writes a file of its own.
+    """
+    global _directory, _process_file
+    if directory is None or _directory is not None:
+        return
+    os.makedirs(directory, exist_ok=True)
+    _directory = directory
+    _process_file = _new_process_file()
+    if hasattr(os, 'register_at_fork'):
+        os.register_at_fork(after_in_child=_after_fork_in_child)
+    _start_flusher()
+
+
+def _after_fork_in_child():
+    """A forked child starts counting from zero - what the parent counted stays in the parent's file"""
+    global _lock, _last_written, _process_file
+    _lock = threading.Lock()
+    _last_written = None
+    _process_file = _new_process_file()
+    for metric in _registry:
+        for child in metric._children.values():
+            child._reset()
+    _start_flusher()
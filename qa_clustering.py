@@ -7,14 +7,12 @@ Usage:
     python3 qa_clustering.py
 """
 
-import pandas as pd
-import numpy as np
 import json
 import os
 from datetime import datetime
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.cluster import KMeans, DBSCAN
-from sklearn.metrics import silhouette_score, calinski_harabasz_score
+
+# pandas is imported inside the methods that use it, so importing this module
+# (e.g. from the app) stays cheap
 
 
 class QAClusteringEngine:
@@ -34,6 +32,8 @@ class QAClusteringEngine:
 
     def load_classification_data(self):
         """Load all classified query results"""
+        import pandas as pd
+
         print("📂 Loading classification data...")
 
         # Find latest results file
@@ -55,6 +55,8 @@ class QAClusteringEngine:
 
     def load_feedback_data(self):
         """Load user feedback from JSONL files"""
+        import pandas as pd
+
         print("📂 Loading feedback data...")
 
         feedback_dir = os.path.join(self.learning_folder, 'feedback')
@@ -77,6 +79,8 @@ class QAClusteringEngine:
 
     def load_corrections_data(self):
         """Load user corrections from CSV"""
+        import pandas as pd
+
         print("📂 Loading corrections data...")
 
         corrections_file = os.path.join(self.learning_folder, 'corrections', 'corrections_master.csv')
@@ -157,6 +161,11 @@ class QAClusteringEngine:
             n_clusters: Number of clusters to create
             method: 'kmeans' or 'dbscan'
         """
+        # scikit-learn takes longer to import than the rest of the module - only loaded here
+        from sklearn.feature_extraction.text import TfidfVectorizer
+        from sklearn.cluster import KMeans, DBSCAN
+        from sklearn.metrics import silhouette_score, calinski_harabasz_score
+
         print(f"\n🔬 Performing text-based clustering ({method})...")
 
         if self.data is None:
@@ -220,6 +229,8 @@ class QAClusteringEngine:
 
     def analyze_cluster_quality(self):
         """Analyze quality metrics for each cluster"""
+        import pandas as pd
+
         print("\n🔍 Analyzing cluster quality...")
 
         if self.clusters is None:
@@ -304,6 +315,8 @@ class QAClusteringEngine:
 
     def integrate_feedback_with_clusters(self):
         """Match user feedback to clusters"""
+        import pandas as pd
+
         print("\n💬 Integrating user feedback...")
 
         if self.clusters is None:
@@ -7,6 +7,9 @@ Tests classification quality from all directions:
 - Middle-to-Top: L3 → L2 → L1
 - Middle-to-Bottom: L3 → L4 → L5 → Query
 
+Every test query is classified once into a shared cache that all four
+directions read from. Test sets can be loaded from CSV, JSONL or TXT files (see load_test_queries).
+
 Version: 2.0
 Last Updated: November 2, 2025
 """
@@ -16,20 +19,120 @@ import os
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from telecom_classifier import TelecomClassifier
+import argparse
+import csv
 import json
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 from collections import defaultdict, Counter
 import statistics
 
+# Column names accepted for the query / expected-L1 fields of a test set file
+QUERY_COLUMNS = ['query', 'keyword', 'keywords', 'search term', 'search query', 'term']
+LABEL_COLUMNS = ['expected_l1', 'l1', 'l1_category', 'label']
+
+# Classifier used by worker processes. With the fork start method this is
+# inherited from the parent; with spawn it is rebuilt in _init_worker.
+_worker_classifier = None
+
+
+def _init_worker(decision_tree_path):
+    """Process pool initializer - make sure each worker has a classifier"""
+    global _worker_classifier
+    if _worker_classifier is None:
+        _worker_classifier = TelecomClassifier(decision_tree_path)
+
+
+def _classify_chunk(queries):
+    """Classify a chunk of queries inside a worker process"""
+    return [(query, _worker_classifier.classify_text(query)) for query in queries]
+
+
+def _pick_column(fieldnames, candidates):
+    """Return the first field name matching one of the candidates (case-insensitive)"""
+    lowered = {name.lower().strip(): name for name in fieldnames if name}
+    for candidate in candidates:
+        if candidate in lowered:
+            return lowered[candidate]
+    return None
+
+
+def load_test_queries(path):
+    """
+    Load a labelled or unlabelled test set from disk
+
+    Supported formats:
+    - .csv/.tsv: a query column (Query/Keyword/...) and optional Expected_L1 column
+    - .jsonl: one JSON string or object per line ({"query": ..., "expected_l1": ...});
+      numeric queries are read as text, other non-string values are skipped
+    - .txt: one query per line
+
+    Returns (queries, labels) where labels holds a (query, expected L1 name or None)
+    pair per query, in file order - a query listed twice keeps each row's label.
+    """
+    ext = path.rsplit('.', 1)[-1].lower()
+    queries = []
+    labels = []
+
+    with open(path, 'r', encoding='utf-8') as f:
+        if ext in ('csv', 'tsv'):
+            reader = csv.DictReader(f, delimiter='\t' if ext == 'tsv' else ',')
+            fieldnames = reader.fieldnames or []
+            query_col = _pick_column(fieldnames, QUERY_COLUMNS) or (fieldnames[0] if fieldnames else None)
+            label_col = _pick_column(fieldnames, LABEL_COLUMNS)
+            if query_col is None:
+                return queries, labels
+            for row in reader:
+                query = (row.get(query_col) or '').strip()
+                if not query:
+                    continue
+                queries.append(query)
+                label = (row.get(label_col) or '').strip() if label_col else ''
+                labels.append((query, label or None))
+        elif ext == 'jsonl':
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                record = json.loads(line)
+                if isinstance(record, dict):
+                    query = record.get('query', record.get('keyword'))
+                    label = record.get('expected_l1') or record.get('l1')
+                else:
+                    query, label = record, None
+                if isinstance(query, (int, float)) and not isinstance(query, bool):
+                    query = str(query)
+                if not isinstance(query, str) or not query.strip():
+                    continue
+                query = query.strip()
+                queries.append(query)
+                labels.append((query, str(label) if label else None))
+        else:
+            queries = [line.strip() for line in f if line.strip()]
+            labels = [(query, None) for query in queries]
+
+    return queries, labels
+
+
 class MultiDirectionalQA:
     """
     Comprehensive QA testing from all directions
     """
 
-    def __init__(self, decision_tree_path):
+    def __init__(self, decision_tree_path, test_queries_path=None, workers=None, print_limit=100):
         self.classifier = TelecomClassifier(decision_tree_path)
         self.decision_tree_path = decision_tree_path
-        self.test_queries = self._generate_test_queries()
+        self.workers = workers if workers is not None else (os.cpu_count() or 1)
+        self.print_limit = print_limit
+        # Expected L1 name (or None) per test query position
+        self.expected_l1 = []
+        if test_queries_path:
+            self.test_queries, labels = load_test_queries(test_queries_path)
+            self.expected_l1 = [label for _, label in labels]
+        else:
+            self.test_queries = self._generate_test_queries()
+        # Shared query -> classify_text() result cache used by every direction
+        self._classification_cache = {}
         self.results = {
             'bottom_to_top': [],
             'top_to_bottom': [],
@@ -106,6 +209,51 @@ class MultiDirectionalQA:
             "prepaid vs postpaid plans"
         ]
 
+    def prime_classification_cache(self):
+        """
+        Classify every distinct test query once so all directions share the result.
+        Large test sets are spread across worker processes.
+        """
+        pending = [q for q in dict.fromkeys(self.test_queries) if q not in self._classification_cache]
+        if not pending:
+            return
+
+        if self.workers <= 1 or len(pending) < 1000:
+            for query in pending:
+                self._classification_cache[query] = self.classifier.classify_text(query)
+            return
+
+        global _worker_classifier
+        _worker_classifier = self.classifier
+        chunk_size = max(100, len(pending) // (self.workers * 8))
+        chunks = [pending[i:i + chunk_size] for i in range(0, len(pending), chunk_size)]
+        with ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                 initargs=(self.decision_tree_path,)) as pool:
+            for chunk_results in pool.map(_classify_chunk, chunks):
+                self._classification_cache.update(chunk_results)
+
+    def _classify(self, query):
+        """Memoized classify_text() shared by all directions"""
+        if query not in self._classification_cache:
+            self._classification_cache[query] = self.classifier.classify_text(query)
+        return self._classification_cache[query]
+
+    def _expected_l1(self, idx):
+        """Expected L1 name of the idx-th test query (1-based), or None if unlabelled"""
+        if idx <= len(self.expected_l1):
+            return self.expected_l1[idx - 1]
+        return None
+
+    def _should_print(self, idx):
+        """Only echo per-query rows for the first print_limit queries"""
+        return self.print_limit is None or idx <= self.print_limit
+
+    def _print_truncation(self):
+        """Note how many per-query rows were not printed"""
+        hidden = len(self.test_queries) - (self.print_limit or 0)
+        if self.print_limit is not None and hidden > 0:
+            print(f"   ... {hidden:,} more queries not shown")
+
     def test_bottom_to_top(self):
         """
         Bottom-to-Top Analysis
@@ -119,7 +267,7 @@ class MultiDirectionalQA:
         results = []
 
         for idx, query in enumerate(self.test_queries, 1):
-            result = self.classifier.classify_text(query)
+            result = self._classify(query)
 
             if result:
                 c = result['classification']
@@ -127,7 +275,7 @@ class MultiDirectionalQA:
                 l2_name = c['L2'].get('name', c['L2'].get('topic', 'Unknown'))
                 l3_name = c['L3'].get('intent_category', c['L3'].get('topic', 'Unknown'))
                 l4_name = c['L4'].get('topic', 'Unknown')
-                l5_name = c['L5'].get('keyword', c['L5'].get('topic', 'Unknown'))
+                l5_name = c.get('L5', {}).get('keyword', c.get('L5', {}).get('topic', 'Unknown'))
 
                 analysis = {
                     'query_id': idx,
@@ -141,22 +289,35 @@ class MultiDirectionalQA:
                 # Validate hierarchy consistency
                 analysis['hierarchy_valid'] = self._validate_hierarchy_bottom_up(result['classification'])
 
+                expected = self._expected_l1(idx)
+                if expected is not None:
+                    analysis['expected_l1'] = expected
+                    analysis['l1_correct'] = l1_name == expected
+
                 results.append(analysis)
 
                 # Print progress
-                status = "✅" if analysis['hierarchy_valid'] else "❌"
-                print(f"{status} [{idx:2d}] {query:50s} | Conf: {analysis['confidence']:5.1f}")
+                if self._should_print(idx):
+                    status = "✅" if analysis['hierarchy_valid'] else "❌"
+                    print(f"{status} [{idx:2d}] {query:50s} | Conf: {analysis['confidence']:5.1f}")
 
             else:
-                results.append({
+                analysis = {
                     'query_id': idx,
                     'query': query,
                     'classification': None,
                     'path': 'UNCLASSIFIED',
                     'hierarchy_valid': False
-                })
-                print(f"❌ [{idx:2d}] {query:50s} | UNCLASSIFIED")
+                }
+                expected = self._expected_l1(idx)
+                if expected is not None:
+                    analysis['expected_l1'] = expected
+                    analysis['l1_correct'] = False
+                results.append(analysis)
+                if self._should_print(idx):
+                    print(f"❌ [{idx:2d}] {query:50s} | UNCLASSIFIED")
 
+        self._print_truncation()
         self.results['bottom_to_top'] = results
 
         # Summary
@@ -185,6 +346,13 @@ class MultiDirectionalQA:
         with open(self.decision_tree_path, 'r') as f:
             tree = json.load(f)
 
+        # Group test queries by their classified L1 once, from the shared cache
+        queries_by_l1 = defaultdict(list)
+        for query in self.test_queries:
+            l1_result_name = self._classified_l1(query)
+            if l1_result_name:
+                queries_by_l1[l1_result_name].append(query)
+
         # Analyze each L1 category
         for l1_key, l1_data in tree.items():
             if l1_key == 'metadata':
@@ -194,8 +362,7 @@ class MultiDirectionalQA:
             print(f"\n📁 L1: {l1_name}")
 
             # Count queries matching this L1
-            l1_queries = [q for q in self.test_queries
-                         if self._query_matches_l1(q, l1_name)]
+            l1_queries = queries_by_l1.get(l1_name, [])
 
             l2_count = len(l1_data.get('subcategories', {}))
             l3_count = sum(len(l2.get('intents', {}))
@@ -244,7 +411,7 @@ class MultiDirectionalQA:
         results = []
 
         for idx, query in enumerate(self.test_queries, 1):
-            result = self.classifier.classify_text(query)
+            result = self._classify(query)
 
             if result:
                 c = result['classification']
@@ -264,8 +431,9 @@ class MultiDirectionalQA:
 
                 results.append(analysis)
 
-                status = "✅" if analysis['rollup_valid'] else "❌"
-                print(f"{status} [{idx:2d}] {l3_name:30s} → {l2_name:30s} → {l1_name}")
+                if self._should_print(idx):
+                    status = "✅" if analysis['rollup_valid'] else "❌"
+                    print(f"{status} [{idx:2d}] {l3_name:30s} → {l2_name:30s} → {l1_name}")
 
             else:
                 results.append({
@@ -273,8 +441,10 @@ class MultiDirectionalQA:
                     'query': query,
                     'rollup_valid': False
                 })
-                print(f"❌ [{idx:2d}] UNCLASSIFIED")
+                if self._should_print(idx):
+                    print(f"❌ [{idx:2d}] UNCLASSIFIED")
 
+        self._print_truncation()
         self.results['middle_to_top'] = results
 
         # Summary
@@ -300,13 +470,13 @@ class MultiDirectionalQA:
         results = []
 
         for idx, query in enumerate(self.test_queries, 1):
-            result = self.classifier.classify_text(query)
+            result = self._classify(query)
 
             if result:
                 c = result['classification']
                 l3_name = c['L3'].get('intent_category', c['L3'].get('topic', 'Unknown'))
                 l4_name = c['L4'].get('topic', 'Unknown')
-                l5_name = c['L5'].get('keyword', c['L5'].get('topic', 'Unknown'))
+                l5_name = c.get('L5', {}).get('keyword', c.get('L5', {}).get('topic', 'Unknown'))
                 confidence = result.get('confidence_score', 0)
 
                 analysis = {
@@ -322,9 +492,10 @@ class MultiDirectionalQA:
 
                 results.append(analysis)
 
-                status = "✅" if analysis['drilldown_valid'] else "❌"
-                conf_str = f"Conf: {confidence:5.1f}"
-                print(f"{status} [{idx:2d}] {l3_name:20s} → {l4_name:40s} | {conf_str}")
+                if self._should_print(idx):
+                    status = "✅" if analysis['drilldown_valid'] else "❌"
+                    conf_str = f"Conf: {confidence:5.1f}"
+                    print(f"{status} [{idx:2d}] {l3_name:20s} → {l4_name:40s} | {conf_str}")
 
             else:
                 results.append({
@@ -332,8 +503,10 @@ class MultiDirectionalQA:
                     'query': query,
                     'drilldown_valid': False
                 })
-                print(f"❌ [{idx:2d}] UNCLASSIFIED")
+                if self._should_print(idx):
+                    print(f"❌ [{idx:2d}] UNCLASSIFIED")
 
+        self._print_truncation()
         self.results['middle_to_bottom'] = results
 
         # Summary
@@ -380,13 +553,16 @@ class MultiDirectionalQA:
 
         return False
 
+    def _classified_l1(self, query):
+        """Return the L1 name the query classified into (from the shared cache)"""
+        result = self._classify(query)
+        if result and 'L1' in result['classification']:
+            return result['classification']['L1'].get('name', result['classification']['L1'].get('topic', ''))
+        return None
+
     def _query_matches_l1(self, query, l1_name):
         """Check if query belongs to L1 category"""
-        result = self.classifier.classify_text(query)
-        if result and 'L1' in result['classification']:
-            l1_result_name = result['classification']['L1'].get('name', result['classification']['L1'].get('topic', ''))
-            return l1_result_name == l1_name
-        return False
+        return self._classified_l1(query) == l1_name
 
     def generate_comprehensive_report(self):
         """Generate comprehensive analysis report"""
@@ -476,6 +652,17 @@ class MultiDirectionalQA:
             }
         }
 
+        # Labelled accuracy (only when the test set carried expected L1 labels)
+        labelled = [r for r in self.results['bottom_to_top'] if 'l1_correct' in r]
+        if labelled:
+            correct = sum(1 for r in labelled if r['l1_correct'])
+            print(f"\n🎯 Labelled L1 Accuracy: {correct}/{len(labelled)} ({correct/len(labelled)*100:.1f}%)")
+            self.results['summary']['labelled_accuracy'] = {
+                'labelled': len(labelled),
+                'correct': correct,
+                'rate': correct / len(labelled) * 100
+            }
+
         return self.results
 
     def get_detailed_metrics(self):
@@ -634,13 +821,16 @@ class MultiDirectionalQA:
 
         print("\n" + "="*80)
 
-    def run_all_tests(self):
+    def run_all_tests(self, output_file='qa_multidirectional_report.json'):
         """Run all directional tests"""
         print("\n" + "="*80)
         print("🚀 MULTI-DIRECTIONAL QA ANALYSIS")
-        print("Testing 50 queries from all directions")
+        print(f"Testing {len(self.test_queries):,} queries from all directions")
         print("="*80)
 
+        # One classification pass shared by every direction
+        self.prime_classification_cache()
+
         # Run all tests
         self.test_bottom_to_top()
         self.test_top_to_bottom()
@@ -654,13 +844,13 @@ class MultiDirectionalQA:
         self.display_recommendations()
 
         # Export results
-        self.export_results()
+        self.export_results(output_file)
 
         print("\n" + "="*80)
         print("✅ MULTI-DIRECTIONAL QA ANALYSIS COMPLETE")
         print("="*80)
         print("\nNext Steps:")
-        print("  1. Review qa_multidirectional_report.json for full details")
+        print(f"  1. Review {output_file} for full details")
         print("  2. Implement recommendations above to improve quality")
         print("  3. Re-run analysis after making changes")
         print("="*80)
@@ -668,14 +858,24 @@ class MultiDirectionalQA:
 
 def main():
     """Main execution"""
-    decision_tree_path = '/Users/venkatapagadala/Desktop/telecom-classification.json'
+    parser = argparse.ArgumentParser(description='Multi-directional QA analysis of the telecom classifier')
+    parser.add_argument('--tree', default='/Users/venkatapagadala/Desktop/telecom-classification.json',
+                        help='Path to the decision tree JSON')
+    parser.add_argument('--queries', help='Test set file (.csv, .tsv, .jsonl or .txt); defaults to the built-in 50 queries')
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes for the classification pass')
+    parser.add_argument('--print-limit', type=int, default=100, help='Per-query rows to print per direction')
+    parser.add_argument('--output', default='qa_multidirectional_report.json', help='Report output path')
+    args = parser.parse_args()
+
+    decision_tree_path = args.tree
 
     if not os.path.exists(decision_tree_path):
         print(f"❌ Decision tree not found: {decision_tree_path}")
         return
 
-    qa = MultiDirectionalQA(decision_tree_path)
-    qa.run_all_tests()
+    qa = MultiDirectionalQA(decision_tree_path, test_queries_path=args.queries,
+                            workers=args.workers, print_limit=args.print_limit)
+    qa.run_all_tests(output_file=args.output)
 
 
 if __name__ == '__main__':
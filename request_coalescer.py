@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Request Coalescing
+Merges concurrent classification requests into shared batches
+
+Under load many request threads classify the same few head terms at once.
+RequestCoalescer sits in front of a batch function (classify_cached): the
+first request to arrive opens a batch and becomes its leader, requests that
+arrive within the window join it, and the leader runs one deduplicated batch
+and fans the results back out. A query already queued or being computed is
+never computed twice - later requests wait for the same result (singleflight).
+Requests whose queries are all in the result cache skip all of this.
+"""
+
+import threading
+from concurrent.futures import Future
+from typing import Callable, Dict, List, Optional
+
+import metrics
+
+# Marks a query absent from the result cache (None is a valid cached result)
+_MISSING = object()
+
+COALESCED_REQUESTS = metrics.Counter('coalescer_requests_total', 'Requests through the request coalescer')
+COALESCED_QUERIES = metrics.Counter(
+    'coalescer_queries_total',
+    'Queries through the request coalescer, by how they were answered (cached, shared, computed or direct)',
+    ['source'])
+COALESCED_BATCH_SIZE = metrics.Histogram('coalescer_batch_size', 'Distinct queries per coalesced batch',
+                                         buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256, 512))
+_CACHED = COALESCED_QUERIES.labels('cached')
+_SHARED = COALESCED_QUERIES.labels('shared')
+_COMPUTED = COALESCED_QUERIES.labels('computed')
+_DIRECT = COALESCED_QUERIES.labels('direct')
+
+
+class _Batch:
+    """Queries collected for one batch call, with the future of each result"""
+
+    __slots__ = ('futures', 'ready')
+
+    def __init__(self):
+        self.futures = {}
+        # Set when waiting longer cannot grow the batch (full, or every caller is waiting)
+        self.ready = threading.Event()
+
+
+class RequestCoalescer:
+    """
+    Coalesce concurrent calls to batch_fn
+
+    window: seconds a batch stays open for more requests (0 disables coalescing)
+    max_batch_size: a batch is closed as soon as it holds this many queries
+    cache: returns the query -> result dict batch_fn fills; fully cached
+    requests are answered from it directly
+    The window also ends as soon as every active caller is waiting on a result:
+    nobody else can join before a new request arrives, so a lone request never waits.
+    """
+
+    def __init__(self, batch_fn: Callable[[List[str]], List[Optional[Dict]]], window: float = 0.002,
+                 max_batch_size: int = 256, cache: Optional[Callable[[], Dict]] = None):
+        self.batch_fn = batch_fn
+        self.window = window
+        self.max_batch_size = max_batch_size
+        self.cache = cache
+        self._lock = threading.Lock()
+        # query -> Future of its result, from joining a batch until the result is delivered
+        self._inflight = {}
+        self._batch = None
+        # Callers inside classify(), and how many of them are blocked on a batch or result
+        self._active = 0
+        self._waiting = 0
+
+    def classify(self, queries: List[str]) -> List[Optional[Dict]]:
+        """Results for queries in input order, computed together with concurrent requests"""
+        if self.cache is not None:
+            known = self.cache()
+            results = [known.get(query, _MISSING) for query in queries]
+            if not any(result is _MISSING for result in results):
+                COALESCED_REQUESTS.inc()
+                _CACHED.inc(len(queries))
+                return results
+        COALESCED_REQUESTS.inc()
+        if self.window <= 0 or len(queries) > self.max_batch_size:
+            _DIRECT.inc(len(queries))
+            return self.batch_fn(queries)
+
+        lead = None
+        futures = []
+        shared = 0
+        with self._lock:
+            self._active += 1
+            for query in queries:
+                future = self._inflight.get(query)
+                if future is not None:
+                    shared += 1
+                else:
+                    if self._batch is None:
+                        self._batch = lead = _Batch()
+                    future = self._inflight[query] = self._batch.futures[query] = Future()
+                    if len(self._batch.futures) >= self.max_batch_size:
+                        # Full: the leader stops waiting, later queries open a new batch
+                        self._batch.ready.set()
+                        self._batch = None
+                futures.append(future)
+            self._park()
+        _SHARED.inc(shared)
+
+        try:
+            if lead is not None:
+                lead.ready.wait(self.window)
+                self._run(lead)
+                with self._lock:
+                    self._park()
+            return [future.result() for future in futures]
+        finally:
+            with self._lock:
+                self._active -= 1
+                self._waiting -= 1
+
+    def _park(self):
+        """Count the caller as waiting (lock held); once all are, the open batch runs"""
+        self._waiting += 1
+        if self._waiting == self._active and self._batch is not None:
+            self._batch.ready.set()
+
+    def _run(self, batch: _Batch):
+        """Close the batch, compute it and deliver every result (or the error) to its future"""
+        with self._lock:
+            if self._batch is batch:
+                self._batch = None
+            # The leader is busy computing rather than waiting
+            self._waiting -= 1
+            pending = list(batch.futures)
+        _COMPUTED.inc(len(pending))
+        COALESCED_BATCH_SIZE.observe(len(pending))
+        try:
+            results = self.batch_fn(pending)
+        except BaseException as error:
+            for query in pending:
+                batch.futures[query].set_exception(error)
+        else:
+            for query, result in zip(pending, results):
+                batch.futures[query].set_result(result)
+        finally:
+            with self._lock:
+                for query in pending:
+                    self._inflight.pop(query, None)
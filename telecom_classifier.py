@@ -5,51 +5,218 @@ Classifies search queries into a 5-level hierarchical taxonomy
 Enhanced with priority-based matching and intent detection
 """
 
+import hashlib
 import json
 import re
+import time
+import unicodedata
 from typing import Dict, Optional, List, Tuple
 import os
+from collections import Counter
+
+import metrics
+from fuzzy_index import MinHashLSHIndex, SymSpellIndex, TfidfTopicIndex
+
+
+# Query normalization - applied identically to indexed keywords and incoming
+# queries so spelling variants resolve to the same exact-match key
+_APOSTROPHES = re.compile(r"['\u2018\u2019`]")
+_DASHES = re.compile(r'[\u2010-\u2015\u2212]')
+_AT_AND_T = re.compile(r'\bat\s*(?:&|and)\s*t\b')
+_AMPERSAND = re.compile(r'\s*&\s*')
+_TRAILING_PLUS = re.compile(r'(?<=[a-z0-9])\+')
+_DOLLAR_AMOUNT = re.compile(r'\$\s*(\d+)(?:\.00)?\b')
+_DOLLAR_WORDS = re.compile(r'\b(\d+)\s*(?:dollars?|bucks?|usd)\b')
+_NON_WORD = re.compile(r'[^a-z0-9$.]+')
+_LOOSE_PERIOD = re.compile(r'(?<!\d)\.|\.(?!\d)')
+_WHITESPACE = re.compile(r'\s+')
+_MODEL_NUMBER = re.compile(r'\b(iphone|ipad|pixel|galaxy|moto|razr|oneplus)(\d)')
+_MODEL_SUFFIX = re.compile(r'(\d)(pro|max|plus|mini|ultra|air|fold|flip|xl|se)\b')
+_PRO_MAX = re.compile(r'promax\b')
+
+# Spelling variants of the same brand/term -> the spelling the taxonomy uses
+# (it files Metro by T-Mobile as "metro" and keeps "straight talk" and
+# "us cellular" as two words, so partial or reordered queries still share tokens)
+_VARIANT_SPELLINGS = [
+    (re.compile(r'\bt ?mobile\b'), 'tmobile'),
+    (re.compile(r'\bmetro ?pcs\b'), 'metro'),
+    (re.compile(r'\bstraighttalk\b'), 'straight talk'),
+    (re.compile(r'\buscellular\b'), 'us cellular'),
+    (re.compile(r'\bc ?spire\b'), 'cspire'),
+    (re.compile(r'\be ?sim\b'), 'esim'),
+    (re.compile(r'\bwi ?fi\b'), 'wifi'),
+    (re.compile(r'\btradein\b'), 'trade in'),
+]
+
+# Sentinels wrapped around a query before intent scanning, so rule literals
+# can be anchored to the start or end of the query
+_QUERY_START = '\x02'
+_QUERY_END = '\x03'
+
+# Marks a query absent from the result cache (None is a valid cached result)
+_MISSING = object()
+
+# Hot-path metrics, served by the app at GET /metrics
+CLASSIFY_SECONDS = metrics.Histogram('classifier_classify_seconds',
+                                     'Time to classify one query, by the match_type of its result', ['stage'])
+CANDIDATES_SCORED = metrics.Histogram('classifier_candidates_scored', 'Keywords scored to classify one query',
+                                      buckets=(0, 1, 10, 50, 100, 500, 1000, 5000, 10000, 50000, 100000))
+RESULT_CACHE_LOOKUPS = metrics.Counter('classifier_result_cache_lookups_total',
+                                       'classify_cached lookups, by result (hit or miss)', ['result'])
+TAXONOMY_LOAD_SECONDS = metrics.Histogram('classifier_taxonomy_load_seconds',
+                                          'Time to load the decision tree and build the indexes',
+                                          buckets=(0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120))
+# Series looked up once, so recording a classification is two observations. The
+# stage is the result's match_type, so /metrics and responses always agree
+STAGES = ('exact', 'typo', 'fuzzy', 'tfidf', 'pattern', 'unclassified')
+_STAGE_SECONDS = {stage: CLASSIFY_SECONDS.labels(stage) for stage in STAGES}
+_CACHE_HITS = RESULT_CACHE_LOOKUPS.labels('hit')
+_CACHE_MISSES = RESULT_CACHE_LOOKUPS.labels('miss')
+
+
+def _stage(result: Optional[Dict]) -> str:
+    """Metric stage of a classification: its match_type"""
+    return result['match_type'] if result else 'unclassified'
+
+
+def _stem_token(token: str) -> str:
+    """Light plural stemmer (plans -> plan, accessories -> accessory)"""
+    if len(token) <= 3 or not token.isalpha():
+        return token
+    if token.endswith('ies') and len(token) > 4:
+        return token[:-3] + 'y'
+    if token.endswith(('ss', 'us', 'is', 'os')):
+        return token
+    if token.endswith('s'):
+        return token[:-1]
+    return token
+
+
+def normalize_query(text: str, stem: bool = False) -> str:
+    """
+    Normalize a query or keyword for indexing and lookup
+    - Unicode folded to plain lowercase ASCII where possible (accents, full-width)
+    - Punctuation and hyphens become spaces, whitespace is collapsed
+    - Dollar amounts unified ("$ 30", "$30.00", "30 dollars" -> "$30")
+    - Brand spelling variants unified (t-mobile/t mobile -> tmobile, at&t -> att,
+      metro pcs -> metro)
+    - Glued device names split (iphone15pro -> iphone 15 pro)
+    - Optional light plural stemming
+    """
+    if not text:
+        return ''
+
+    text = unicodedata.normalize('NFKD', text)
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch)).lower()
+    text = _APOSTROPHES.sub('', text)
+    text = _DASHES.sub('-', text)
+
+    text = _AT_AND_T.sub('att', text)
+    text = _AMPERSAND.sub(' and ', text)
+    text = _TRAILING_PLUS.sub(' plus', text)
+    text = _DOLLAR_WORDS.sub(r'$\1', text)
+    text = _DOLLAR_AMOUNT.sub(r'$\1', text)
+
+    text = _NON_WORD.sub(' ', text)
+    text = _LOOSE_PERIOD.sub(' ', text)
+    text = _MODEL_NUMBER.sub(r'\1 \2', text)
+    text = _PRO_MAX.sub(' pro max', text)
+    text = _MODEL_SUFFIX.sub(r'\1 \2', text)
+    text = _WHITESPACE.sub(' ', text).strip()
+
+    for pattern, canonical in _VARIANT_SPELLINGS:
+        text = pattern.sub(canonical, text)
+
+    if stem:
+        text = ' '.join(_stem_token(token) for token in text.split())
+
+    return text
+
+
+def _literal_trie_regex(literals) -> str:
+    """
+    Build a regex matching any of the literals, with common prefixes merged
+    into a trie. Children are tried before a node's own end, so at any
+    position the longest literal starting there is the one matched.
+    """
+    trie = {}
+    for literal in literals:
+        node = trie
+        for ch in literal:
+            node = node.setdefault(ch, {})
+        node[''] = {}
+
+    def to_regex(node: Dict) -> str:
+        branches = [re.escape(ch) + to_regex(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ''
+        if len(branches) == 1 and '' not in node:
+            return branches[0]
+        return '(?:' + '|'.join(branches) + ')' + ('?' if '' in node else '')
+
+    return to_regex(trie)
 
 
 class TelecomClassifier:
     """Classifies telecom-related search queries using a decision tree"""
 
-    # Category priority for disambiguation (higher = more specific)
-    CATEGORY_PRIORITY = {
+    # Category scoring rules: base priority for disambiguation (higher = more
+    # specific) and the priority boost applied when a matching intent is detected.
+    # The intent map also defines which category each intent expects.
+    CATEGORY_RULES = {
         # High-value specific categories
-        'Customer Service': 95,
-        'Unlocking': 90,
-        'Activation': 90,
-        'Trade In': 88,
-        'Switching': 85,
-        'BYOD': 85,
-        'International': 82,
-        'Connected Devices': 80,
+        'Customer Service': (95, {'customer_service': 60}),
+        'Unlocking': (90, {'unlock': 50}),
+        'Activation': (90, {'activate': 50}),
+        'Trade In': (88, {'trade_in': 50}),
+        'Switching': (85, {'switch': 50}),
+        'BYOD': (85, {}),
+        'International': (82, {'international': 60}),
+        'Connected Devices': (80, {'connected_device': 60}),
 
         # Medium-specific categories
-        'Comparisons': 75,
-        'Reviews': 75,
-        'Perks': 72,
-        'Accessories': 70,
-        'SIM': 70,
-        'Billing': 68,
-        'Retail': 65,
-        'Local': 65,
-        'Coverage': 62,
-        'Pricing': 60,
-        'Deals': 58,
-        'Family Plans': 55,
-        'Prepaid': 55,
-        'Postpaid': 55,
+        'Comparisons': (75, {'compare': 60}),
+        'Reviews': (75, {'review': 40}),
+        'Perks': (72, {}),
+        'Accessories': (70, {}),
+        'SIM': (70, {'sim': 60}),
+        'Billing': (68, {}),
+        'Retail': (65, {'store': 50, 'retail': 40}),
+        'Local': (65, {'local': 70}),
+        'Coverage': (62, {'coverage': 40}),
+        'Pricing': (60, {}),
+        'Deals': (58, {}),
+        'Family Plans': (55, {}),
+        'Prepaid': (55, {}),
+        'Postpaid': (55, {}),
 
         # Broad categories (lower priority)
-        'Mobile Plans': 40,
-        'Devices': 35,
-        'Features': 30,
-        'Support': 25,
-        'FAQ': 20,
-        'Carriers': 15,
+        'Mobile Plans': (40, {'plan': 30}),
+        'Devices': (35, {}),
+        'Features': (30, {}),
+        'Support': (25, {}),
+        'FAQ': (20, {}),
+        'Carriers': (15, {}),
     }
+    DEFAULT_CATEGORY_PRIORITY = 50
+
+    # Minimum cosine similarity for the optional TF-IDF nearest-topic fallback
+    TFIDF_MIN_SIMILARITY = 0.3
+
+    # Results kept by classify_cached (result_cache: query -> result); cleared when full
+    RESULT_CACHE_SIZE = 10000
+
+    # Pattern names per detected slot, in first-match priority order
+    PATTERN_PRIORITY = [
+        ('device', ['iphone', 'samsung', 'pixel']),
+        ('plan_type', ['prepaid', 'postpaid', 'unlimited', 'family']),
+        ('intent', ['buy', 'compare', 'price', 'review', 'support', 'upgrade']),
+        ('service', ['5g', 'internet', 'streaming', 'international']),
+    ]
+
+    # Derived views of CATEGORY_RULES
+    CATEGORY_PRIORITY = {category: rule[0] for category, rule in CATEGORY_RULES.items()}
+    INTENT_CATEGORY = {intent: category for category, rule in CATEGORY_RULES.items() for intent in rule[1]}
 
     # Intent keywords for better classification (order matters - more specific first)
     INTENT_INDICATORS = {
@@ -67,7 +234,7 @@ class TelecomClassifier:
         'international': ['international calling', 'international plan', 'international roaming', 'roaming', 'abroad', 'overseas', 'travel plan'],
         'sim': ['esim', 'e-sim', 'sim card', 'what is esim', 'what is sim'],
         'connected_device': ['tablet plan', 'tablet cellular', 'ipad plan', 'smartwatch plan', 'apple watch plan', 'galaxy watch plan', 'wearable plan'],
-        # Note: 'local' intent is detected via _has_location() with city names only
+        # Note: 'local' intent is detected via INTENT_RULES with city names only
         # 'near me' should NOT trigger local - it depends on context (coverage near me vs stores near me)
         'plan': ['budget plan', 'budget phone plan', 'cheap plan', 'affordable plan'],
     }
@@ -131,13 +298,44 @@ class TelecomClassifier:
         'st. louis', 'pittsburgh', 'stockton', 'cincinnati', 'anchorage', 'henderson',
     ]
 
-    def __init__(self, decision_tree_path: str):
+    # Intent rules in priority order - the first rule whose term groups all hit
+    # wins. A group hits when any of its literals occurs in the lowercased query;
+    # _QUERY_START/_QUERY_END anchor a literal to the start/end of the query.
+    INTENT_RULES = [
+        # City name required for local intent - "near me" alone could be coverage, stores, etc.
+        ('local', [LOCATION_KEYWORDS]),
+        ('compare', [[' vs ', _QUERY_START + 'vs ', ' vs' + _QUERY_END]]),
+        ('customer_service', [['customer service', 'service number', 'customer support']]),
+        ('connected_device', [['tablet plan', 'tablet cellular', 'tablet data']]),
+        ('international', [['international'], ['calling', 'plan']]),
+        ('plan', [['budget'], ['plan']]),
+    ] + [(intent, [indicators]) for intent, indicators in INTENT_INDICATORS.items()]
+
+    def __init__(self, decision_tree_path: str, stem: bool = False, max_edit_distance: int = 2,
+                 lsh_bands: int = 0, lsh_rows: int = 2, tfidf_fallback: bool = False):
         self.decision_tree_path = decision_tree_path
+        self.stem = stem
+        self.max_edit_distance = max_edit_distance
+        self.lsh_bands = lsh_bands
+        self.lsh_rows = lsh_rows
+        self.tfidf_fallback = tfidf_fallback
+        self.typo_index = None
+        self.lsh_index = None
+        self.tfidf_index = None
+        self.topics = []
         self.taxonomy = None
+        self.taxonomy_version = None
         self.keywords_index = {}
+        self.verbatim_keywords = {}
+        self.verbatim_overrides = frozenset()
+        self.keyword_entries = []
+        self.category_ids = {}
         self.patterns = {}
+        self.result_cache = {}
+        start = time.perf_counter()
         self._load_decision_tree()
         self._build_indexes()
+        TAXONOMY_LOAD_SECONDS.observe(time.perf_counter() - start)
 
     def _load_decision_tree(self):
         """Load the classification decision tree from JSON"""
@@ -150,10 +348,24 @@ class TelecomClassifier:
             else:
                 raise FileNotFoundError(f"Decision tree not found: {self.decision_tree_path}")
 
-        with open(self.decision_tree_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            self.taxonomy = data.get('taxonomy', data)
-            self.metadata = data.get('classification_system', {})
+        with open(self.decision_tree_path, 'rb') as f:
+            raw = f.read()
+        data = json.loads(raw.decode('utf-8'))
+        self.taxonomy = data.get('taxonomy', data)
+        self.metadata = data.get('classification_system', {})
+        # Hash state of the raw tree, extended with the options by _update_taxonomy_version
+        self._tree_hash = hashlib.sha256(raw)
+        self._update_taxonomy_version()
+
+    def _update_taxonomy_version(self):
+        """
+        Identify the tree content plus the options that change results, so
+        stored results can be checked against the classifier that would redo them
+        """
+        options = (self.stem, self.max_edit_distance, self.lsh_bands, self.lsh_rows, self.tfidf_fallback)
+        version = self._tree_hash.copy()
+        version.update(repr(options).encode())
+        self.taxonomy_version = version.hexdigest()[:16]
 
     def _build_indexes(self):
         """Build keyword and pattern indexes for fast lookup"""
@@ -162,6 +374,9 @@ class TelecomClassifier:
 
         # Index all L5 keywords for exact/fuzzy matching
         l1_categories = self.taxonomy.get('L1_categories', [])
+        topic_documents = []
+        # Lowercased keyword -> its normalized key
+        verbatim_keys = {}
 
         for l1 in l1_categories:
             l1_info = {'id': l1['id'], 'name': l1['name'], 'slug': l1.get('slug', '')}
@@ -189,21 +404,108 @@ class TelecomClassifier:
                             'primary_cta': l4.get('primary_cta', ''),
                             'secondary_cta': l4.get('secondary_cta', '')
                         }
+                        self.topics.append({'L1': l1_info, 'L2': l2_info, 'L3': l3_info, 'L4': l4_info})
+                        topic_words = [self._normalize(l4.get('topic', ''))]
 
                         for l5 in l4.get('L5_keywords', []):
-                            keyword = l5.get('keyword', '').lower().strip()
+                            verbatim = l5.get('keyword', '').lower().strip()
+                            keyword = self._normalize(l5.get('keyword', ''))
+                            classification = {
+                                'L1': l1_info,
+                                'L2': l2_info,
+                                'L3': l3_info,
+                                'L4': l4_info,
+                                'L5': l5
+                            }
+                            if verbatim:
+                                # A query that is literally this keyword gets this keyword's classification
+                                self.verbatim_keywords[verbatim] = classification
+                                verbatim_keys[verbatim] = keyword
                             if keyword:
-                                self.keywords_index[keyword] = {
-                                    'L1': l1_info,
-                                    'L2': l2_info,
-                                    'L3': l3_info,
-                                    'L4': l4_info,
-                                    'L5': l5
-                                }
+                                topic_words.append(keyword)
+                                # Spelling variants collapse onto one key; a keyword already
+                                # written in the normalized spelling keeps the slot
+                                existing = self.keywords_index.get(keyword)
+                                if existing and existing['L5'].get('keyword', '').lower().strip() == keyword:
+                                    continue
+                                self.keywords_index[keyword] = classification
+                        topic_documents.append(' '.join(topic_words))
+
+        # Keywords whose own classification is not the one their normalized key resolves to
+        self.verbatim_overrides = frozenset(
+            verbatim for verbatim, keyword in verbatim_keys.items()
+            if self.keywords_index.get(keyword) is not self.verbatim_keywords[verbatim])
+
+        # Precompute each keyword's token set and L1 category id once so
+        # scoring never re-splits and priority lookups are a list index
+        self.category_ids = {}
+        for classification in self.keywords_index.values():
+            self.category_ids.setdefault(classification['L1']['name'], len(self.category_ids))
+        self.keyword_entries = [
+            (keyword, frozenset(keyword.split()), classification, self.category_ids[classification['L1']['name']])
+            for keyword, classification in self.keywords_index.items()
+        ]
+        # Keywords per category id: what an in-category scan scores
+        self._category_sizes = Counter(category_id for _, _, _, category_id in self.keyword_entries)
+        self._build_priority_tables()
+
+        # Typo-tolerant lookup over every keyword token (max_edit_distance=0 disables)
+        if self.max_edit_distance > 0:
+            token_counts = Counter(token for _, keyword_words, _, _ in self.keyword_entries for token in keyword_words)
+            self.typo_index = SymSpellIndex(token_counts, self.max_edit_distance)
+
+        # Approximate Stage 3 candidate generation (lsh_bands=0 scans every keyword)
+        self.build_lsh_index(self.lsh_bands, self.lsh_rows)
+
+        # Optional vectorized fallback: one TF-IDF vector per L4 topic
+        if self.tfidf_fallback:
+            self.tfidf_index = TfidfTopicIndex(topic_documents)
 
         # Build common patterns for fuzzy matching
         self._build_patterns()
 
+    def _build_priority_tables(self):
+        """
+        Precompute category priority arrays (indexed by category id) for no
+        intent and for every intent in CATEGORY_RULES
+        """
+        base = [0] * len(self.category_ids)
+        for category, category_id in self.category_ids.items():
+            base[category_id] = self._get_category_priority(category)
+        self._base_priorities = base
+
+        self._intent_priorities = {}
+        for category, (_, boosts) in self.CATEGORY_RULES.items():
+            category_id = self.category_ids.get(category)
+            for intent, boost in boosts.items():
+                priorities = self._intent_priorities.setdefault(intent, list(base))
+                if category_id is not None:
+                    priorities[category_id] += boost
+
+    def build_lsh_index(self, bands: int, rows: int = 2):
+        """
+        (Re)build the MinHash LSH index used to pick Stage 3 candidates
+        instead of scoring every keyword; bands=0 restores the exhaustive scan.
+        More bands raise recall, more rows per band prune harder.
+        Results depend on these settings, so the taxonomy version changes and
+        the result cache starts empty.
+        """
+        self.lsh_bands = bands
+        self.lsh_rows = rows
+        self._update_taxonomy_version()
+        # A new dict, so classify_cached calls still running fill the old one
+        self.result_cache = {}
+        if bands <= 0:
+            self.lsh_index = None
+            self._entry_ids = {}
+            return
+        self.lsh_index = MinHashLSHIndex([entry[1] for entry in self.keyword_entries], bands, rows)
+        self._entry_ids = {entry[0]: i for i, entry in enumerate(self.keyword_entries)}
+
+    def _normalize(self, text: str) -> str:
+        """Normalize text the same way for index keys and lookups"""
+        return normalize_query(text, stem=self.stem)
+
     def _build_patterns(self):
         """Build regex patterns for common query types"""
         self.patterns = {
@@ -232,39 +534,66 @@ class TelecomClassifier:
             'streaming': r'\b(stream|netflix|hulu|disney|hbo)',
             'international': r'\b(international|roaming|abroad|travel)',
         }
+        self._compile_pattern_scanner()
+        self._compile_intent_matcher()
 
-    def _detect_intent(self, query: str) -> Optional[str]:
-        """Detect the primary intent from query"""
-        query_lower = query.lower()
-
-        # Check for location-based queries (city name required for local intent)
-        # "near me" alone should NOT trigger local - it could be coverage, stores, etc.
-        if self._has_location(query_lower):
-            return 'local'
-
-        # Check for "vs" comparison pattern (very specific)
-        if ' vs ' in query_lower or query_lower.endswith(' vs') or query_lower.startswith('vs '):
-            return 'compare'
-
-        # Check for customer service patterns (very specific - should always go to Customer Service)
-        if 'customer service' in query_lower or 'service number' in query_lower or 'customer support' in query_lower:
-            return 'customer_service'
-
-        # Check for connected device patterns
-        if any(x in query_lower for x in ['tablet plan', 'tablet cellular', 'tablet data']):
-            return 'connected_device'
-
-        # Check for international patterns
-        if 'international' in query_lower and ('calling' in query_lower or 'plan' in query_lower):
-            return 'international'
-
-        # Check for plan-focused queries (budget/cheap plan)
-        if 'budget' in query_lower and 'plan' in query_lower:
-            return 'plan'
+    def _compile_pattern_scanner(self):
+        """
+        Compile all patterns into one expression scanned in a single pass.
+        Every pattern starts at a word boundary, so the scanner only tries them
+        at word starts. Each pattern sits in its own zero-width lookahead with a
+        named group, so a match never consumes text another pattern could also
+        match; _pattern_slots maps the group name back to (slot, rank, name).
+        """
+        alternatives = []
+        self._pattern_slots = {}
+        for slot, names in self.PATTERN_PRIORITY:
+            for rank, name in enumerate(names):
+                pattern = self.patterns[name]
+                if pattern.startswith(r'\b'):
+                    pattern = pattern[2:]
+                group = f'p{len(alternatives)}'
+                alternatives.append(f'(?=(?P<{group}>{pattern}))')
+                self._pattern_slots[group] = (slot, rank, name)
+        self._pattern_scanner = re.compile(r'(?<!\w)(?=\w)(?:' + '|'.join(alternatives) + ')')
+
+    def _compile_intent_matcher(self):
+        """
+        Compile INTENT_RULES into one automaton over every rule literal.
+        The scanner reports the longest literal at each position; each literal
+        maps to a bitmask of the rule term groups it satisfies, folded together
+        with those of its prefixes since they match at the same position. A rule
+        fires when all of its group bits are set.
+        """
+        group_masks = {}
+        self._intent_rule_masks = []
+        bit = 0
+        for intent, groups in self.INTENT_RULES:
+            rule_mask = 0
+            for group in groups:
+                for literal in group:
+                    group_masks[literal] = group_masks.get(literal, 0) | (1 << bit)
+                rule_mask |= 1 << bit
+                bit += 1
+            self._intent_rule_masks.append((rule_mask, intent))
+
+        self._intent_literal_masks = {}
+        for literal in group_masks:
+            mask = 0
+            for end in range(1, len(literal) + 1):
+                mask |= group_masks.get(literal[:end], 0)
+            self._intent_literal_masks[literal] = mask
+        self._intent_scanner = re.compile('(?=(' + _literal_trie_regex(group_masks) + '))')
 
-        for intent, indicators in self.INTENT_INDICATORS.items():
-            for indicator in indicators:
-                if indicator in query_lower:
+    def _detect_intent(self, query: str) -> Optional[str]:
+        """Detect the primary intent from query (highest-priority rule in INTENT_RULES)"""
+        hits = 0
+        literal_masks = self._intent_literal_masks
+        for match in self._intent_scanner.finditer(_QUERY_START + query.lower() + _QUERY_END):
+            hits |= literal_masks[match.group(1)]
+        if hits:
+            for rule_mask, intent in self._intent_rule_masks:
+                if hits & rule_mask == rule_mask:
                     return intent
         return None
 
@@ -309,39 +638,30 @@ class TelecomClassifier:
 
     def _get_category_priority(self, category: str) -> int:
         """Get priority score for a category"""
-        return self.CATEGORY_PRIORITY.get(category, 50)
+        return self.CATEGORY_PRIORITY.get(category, self.DEFAULT_CATEGORY_PRIORITY)
 
     def _get_expected_category_from_intent(self, intent: Optional[str]) -> Optional[str]:
         """Map detected intent to expected category"""
         if not intent:
             return None
-        intent_to_category = {
-            'customer_service': 'Customer Service',
-            'store': 'Retail',
-            'retail': 'Retail',
-            'unlock': 'Unlocking',
-            'switch': 'Switching',
-            'coverage': 'Coverage',
-            'compare': 'Comparisons',
-            'review': 'Reviews',
-            'trade_in': 'Trade In',
-            'activate': 'Activation',
-            'international': 'International',
-            'sim': 'SIM',
-            'connected_device': 'Connected Devices',
-            'local': 'Local',
-            'plan': 'Mobile Plans',
-        }
-        return intent_to_category.get(intent)
+        return self.INTENT_CATEGORY.get(intent)
+
+    def expected_category(self, query: str) -> Optional[str]:
+        """
+        L1 category the query's detected intent points to, if any
+        An exact keyword hit in a different category is re-checked by classify_text
+        """
+        return self._get_expected_category_from_intent(self._detect_intent(query.lower().strip()))
 
     def _find_intent_aligned_match(self, query: str, query_words: set, target_category: str) -> Optional[Dict]:
         """Find a keyword match that aligns with the detected intent category"""
         best_match = None
         best_score = 0
+        target_id = self.category_ids.get(target_category)
 
-        for keyword, classification in self.keywords_index.items():
-            if classification['L1']['name'] == target_category:
-                score = self._calculate_match_score(query, query_words, keyword)
+        for keyword, keyword_words, classification, category_id in self.keyword_entries:
+            if category_id == target_id:
+                score = self._calculate_match_score(query, query_words, keyword, keyword_words)
                 if score > best_score and score >= 0.5:
                     best_score = score
                     best_match = classification
@@ -352,10 +672,11 @@ class TelecomClassifier:
         """Find the best fuzzy match in a specific category, with lower threshold"""
         best_match = None
         best_score = 0
+        target_id = self.category_ids.get(target_category)
 
-        for keyword, classification in self.keywords_index.items():
-            if classification['L1']['name'] == target_category:
-                score = self._calculate_match_score(query, query_words, keyword)
+        for keyword, keyword_words, classification, category_id in self.keyword_entries:
+            if category_id == target_id:
+                score = self._calculate_match_score(query, query_words, keyword, keyword_words)
                 # Lower threshold for strong intent matches
                 if score > best_score and score >= 0.25:
                     best_score = score
@@ -372,127 +693,253 @@ class TelecomClassifier:
         if not query or not query.strip():
             return None
 
+        start = time.perf_counter()
+        result, scored = self._classify_by_keywords(query)
+        if result is None:
+            result = self._classify_fallback([query])[0]
+        _STAGE_SECONDS[_stage(result)].observe(time.perf_counter() - start)
+        CANDIDATES_SCORED.observe(scored)
+        return result
+
+    def _classify_by_keywords(self, query: str) -> Tuple[Optional[Dict], int]:
+        """
+        Stages 1-3: intent detection, exact match and keyword scoring
+        Returns (result, keywords scored); the result is None when no keyword scores >= 0.3
+        """
+        scored = 0
         query_lower = query.lower().strip()
-        query_words = set(query_lower.split())
+        # Index lookups and scoring use the normalized form; intent and
+        # pattern detection keep working on the plain lowercased query
+        query_norm = self._normalize(query)
+        query_words = set(query_norm.split())
+
+        # Misspelled tokens that occur in no keyword are corrected before
+        # matching; a corrected exact hit is reported below full confidence, as 'typo'
+        corrected_norm = self._correct_typos(query_norm, query_words)
+        if corrected_norm:
+            query_norm = corrected_norm
+            query_words = set(query_norm.split())
 
         # Stage 1: Detect primary intent FIRST (for smart disambiguation)
         detected_intent = self._detect_intent(query_lower)
 
-        # Stage 2: Exact match - but consider intent for disambiguation
-        if query_lower in self.keywords_index:
-            match = self.keywords_index[query_lower]
+        # Stage 2: Exact match - but consider intent for disambiguation. A query that
+        # is literally a keyword gets that keyword's own classification, even where
+        # spelling variants share its normalized key
+        match = self.verbatim_keywords.get(query_lower)
+        if match is None:
+            match = self.keywords_index.get(query_norm)
+        if match is not None:
             actual_category = match['L1']['name']
 
             # Check if intent suggests a different category should be prioritized
             expected_category = self._get_expected_category_from_intent(detected_intent)
             if expected_category and actual_category != expected_category:
+                category_size = self._category_sizes[self.category_ids.get(expected_category)]
                 # For strong intent signals, find the best match in the expected category
-                alt_match = self._find_intent_aligned_match(query_lower, query_words, expected_category)
+                alt_match = self._find_intent_aligned_match(query_norm, query_words, expected_category)
+                scored += category_size
                 if alt_match:
-                    return self._format_result(alt_match, query, confidence=0.95)
+                    return self._format_result(alt_match, query, confidence=0.95), scored
                 # Even if no exact match, if intent is strong, search harder
                 if detected_intent in ['local', 'compare', 'customer_service', 'international', 'connected_device']:
-                    best_fuzzy = self._find_best_fuzzy_in_category(query_lower, query_words, expected_category)
+                    best_fuzzy = self._find_best_fuzzy_in_category(query_norm, query_words, expected_category)
+                    scored += category_size
                     if best_fuzzy:
-                        return self._format_result(best_fuzzy, query, confidence=0.85)
+                        return self._format_result(best_fuzzy, query, confidence=0.85), scored
 
-            return self._format_result(match, query, confidence=1.0)
+            if corrected_norm:
+                return self._format_result(match, query, confidence=0.9, match_type='typo'), scored
+            return self._format_result(match, query, confidence=1.0), scored
 
-        # Stage 3: Find all matching keywords with scores
-        candidates = []
+        # Stage 3: Stream all matching keywords with scores. Only candidates within
+        # 0.05 of the running top score can win, so instead of collecting and
+        # sorting every match we keep the best (priority, keyword length) per
+        # distinct score inside that band: score -> (priority, length, classification)
+        top_score = None
+        band = {}
 
         # For very strong intent signals, restrict search to that category only
         restrict_to_category = None
         if detected_intent in ['customer_service']:
             restrict_to_category = self._get_expected_category_from_intent(detected_intent)
 
-        for keyword, classification in self.keywords_index.items():
-            category = classification['L1']['name']
+        # Category priorities for this query's intent, indexed by category id
+        priorities = self._intent_priorities.get(detected_intent, self._base_priorities)
+        restrict_id = self.category_ids.get(restrict_to_category) if restrict_to_category else None
+
+        entries = self.keyword_entries
+        if self.lsh_index is not None:
+            entries = self._lsh_candidates(query_norm, query_words)
+        if not restrict_to_category:
+            scored += len(entries)
+        elif entries is self.keyword_entries:
+            scored += self._category_sizes[restrict_id]
+        else:
+            scored += sum(1 for entry in entries if entry[3] == restrict_id)
 
+        for keyword, keyword_words, classification, category_id in entries:
             # If restricted, skip other categories
-            if restrict_to_category and category != restrict_to_category:
+            if restrict_to_category and category_id != restrict_id:
                 continue
 
-            score = self._calculate_match_score(query_lower, query_words, keyword)
+            score = self._calculate_match_score(query_norm, query_words, keyword, keyword_words)
             if score >= 0.3:
-                priority = self._get_category_priority(category)
-
-                # Boost priority if intent matches category
-                if detected_intent:
-                    if detected_intent == 'customer_service' and category == 'Customer Service':
-                        priority += 60
-                    elif detected_intent == 'store' and category == 'Retail':
-                        priority += 50
-                    elif detected_intent == 'retail' and category == 'Retail':
-                        priority += 40
-                    elif detected_intent == 'unlock' and category == 'Unlocking':
-                        priority += 50
-                    elif detected_intent == 'switch' and category == 'Switching':
-                        priority += 50
-                    elif detected_intent == 'coverage' and category == 'Coverage':
-                        priority += 40
-                    elif detected_intent == 'compare' and category == 'Comparisons':
-                        priority += 60
-                    elif detected_intent == 'review' and category == 'Reviews':
-                        priority += 40
-                    elif detected_intent == 'trade_in' and category == 'Trade In':
-                        priority += 50
-                    elif detected_intent == 'activate' and category == 'Activation':
-                        priority += 50
-                    elif detected_intent == 'international' and category == 'International':
-                        priority += 60
-                    elif detected_intent == 'sim' and category == 'SIM':
-                        priority += 60
-                    elif detected_intent == 'connected_device' and category == 'Connected Devices':
-                        priority += 60
-                    elif detected_intent == 'local' and category == 'Local':
-                        priority += 70
-                    elif detected_intent == 'plan' and category == 'Mobile Plans':
-                        priority += 30
-
-                candidates.append({
-                    'classification': classification,
-                    'score': score,
-                    'priority': priority,
-                    'keyword': keyword
-                })
-
-        if candidates:
-            # Sort by: 1) score (descending), 2) priority (descending), 3) keyword length (descending)
-            candidates.sort(key=lambda x: (x['score'], x['priority'], len(x['keyword'])), reverse=True)
-
-            # If top candidates have same score, prefer higher priority category
-            top_score = candidates[0]['score']
-            top_candidates = [c for c in candidates if c['score'] >= top_score - 0.05]
-
-            if len(top_candidates) > 1:
-                # Re-sort by priority
-                top_candidates.sort(key=lambda x: x['priority'], reverse=True)
-
-            best = top_candidates[0]
-            return self._format_result(best['classification'], query, confidence=best['score'])
-
-        # Stage 4: Pattern-based classification as fallback
-        pattern_match = self._classify_by_patterns(query_lower)
-        if pattern_match:
-            return pattern_match
+                if top_score is not None and score < top_score - 0.05:
+                    continue
 
-        return None
+                # Base category priority, boosted if the detected intent matches the category
+                priority = priorities[category_id]
 
-    def _calculate_match_score(self, query: str, query_words: set, keyword: str) -> float:
-        """Calculate similarity score between query and keyword"""
-        keyword_words = set(keyword.split())
+                # Within one score, higher priority then longer keyword wins;
+                # on a full tie the earlier keyword is kept
+                current = band.get(score)
+                if (current is None or priority > current[0]
+                        or (priority == current[0] and len(keyword) > current[1])):
+                    band[score] = (priority, len(keyword), classification)
 
+                if top_score is None or score > top_score:
+                    top_score = score
+                    band = {s: c for s, c in band.items() if s >= top_score - 0.05}
+
+        if band:
+            # Among the top band, prefer higher priority category, then score, then keyword length
+            best_score = max(band, key=lambda s: (band[s][0], s, band[s][1]))
+            return self._format_result(band[best_score][2], query, confidence=best_score), scored
+
+        return None, scored
+
+    def _classify_fallback(self, queries: List[str]) -> List[Optional[Dict]]:
+        """
+        Stage 4 for queries no keyword matched: the nearest L4 topic by TF-IDF
+        similarity when enabled (one chunked sparse multiply for the whole
+        list), then regex patterns
+        """
+        results = [None] * len(queries)
+        if self.tfidf_index is not None:
+            nearest = self.tfidf_index.nearest([self._normalize(query) for query in queries])
+            for i, match in enumerate(nearest):
+                if match and match[1] >= self.TFIDF_MIN_SIMILARITY:
+                    result = self._format_result(self.topics[match[0]], queries[i],
+                                                 confidence=round(min(match[1], 0.9), 4))
+                    result['match_type'] = 'tfidf'
+                    results[i] = result
+
+        for i, query in enumerate(queries):
+            if results[i] is None:
+                results[i] = self._classify_by_patterns(query.lower().strip())
+        return results
+
+    def _lsh_candidate_ids(self, query_norm: str, query_words: set) -> set:
+        """
+        keyword_entries positions proposed by the LSH index. Keywords spelled
+        out inside the query score 0.9 whatever their Jaccard, so every
+        contiguous token phrase of the query that is itself a keyword is added
+        """
+        entry_ids = self.lsh_index.query(query_words)
+        tokens = query_norm.split()
+        for start in range(len(tokens)):
+            for end in range(start + 1, len(tokens) + 1):
+                entry_id = self._entry_ids.get(' '.join(tokens[start:end]))
+                if entry_id is not None:
+                    entry_ids.add(entry_id)
+        return entry_ids
+
+    def _lsh_candidates(self, query_norm: str, query_words: set) -> List[tuple]:
+        """Stage 3 candidates in keyword_entries order, so ties break as in the exhaustive scan"""
+        entries = self.keyword_entries
+        return [entries[i] for i in sorted(self._lsh_candidate_ids(query_norm, query_words))]
+
+    def _correct_typos(self, query_norm: str, query_words: set) -> Optional[str]:
+        """
+        Replace query tokens unknown to the keyword vocabulary with their closest
+        vocabulary token within the typo index's edit distance bound
+        Returns the corrected normalized query, or None if nothing changed
+        """
+        if self.typo_index is None or query_words <= self.typo_index.vocabulary:
+            return None
+        tokens = query_norm.split()
+        corrected = self.typo_index.correct_tokens(tokens)
+        if corrected == tokens:
+            return None
+        return ' '.join(corrected)
+
+    def classify_batch(self, queries: List[str]) -> List[Optional[Dict]]:
+        """
+        Classify a list of queries, computing each distinct query only once
+        Queries no keyword matched share one fallback pass
+        Returns results in the same order as the input
+        """
+        cache = {}
+        leftovers = []
+        # Keyword-stage seconds of each leftover, timed again once the fallback ran
+        leftover_seconds = []
+        for query in queries:
+            if query not in cache:
+                cache[query] = None
+                if not (query and query.strip()):
+                    continue
+                start = time.perf_counter()
+                cache[query], scored = self._classify_by_keywords(query)
+                elapsed = time.perf_counter() - start
+                CANDIDATES_SCORED.observe(scored)
+                if cache[query] is None:
+                    leftovers.append(query)
+                    leftover_seconds.append(elapsed)
+                else:
+                    _STAGE_SECONDS[_stage(cache[query])].observe(elapsed)
+
+        if leftovers:
+            start = time.perf_counter()
+            results = self._classify_fallback(leftovers)
+            # One pass serves every leftover; each is charged an equal share of it
+            share = (time.perf_counter() - start) / len(leftovers)
+            for query, result, elapsed in zip(leftovers, results, leftover_seconds):
+                cache[query] = result
+                _STAGE_SECONDS[_stage(result)].observe(elapsed + share)
+        return [cache[query] for query in queries]
+
+    def classify_cached(self, queries: List[str]) -> List[Optional[Dict]]:
+        """
+        classify_batch for request handlers that see the same queries again and again
+        Queries answered before come from a bounded result cache; the results
+        are shared between callers and must not be modified
+        """
+        cache = self.result_cache
+        found = {query: cache.get(query, _MISSING) for query in queries}
+        misses = [query for query, result in found.items() if result is _MISSING]
+        _CACHE_HITS.inc(len(found) - len(misses))
+        _CACHE_MISSES.inc(len(misses))
+        if misses:
+            if len(cache) + len(misses) > self.RESULT_CACHE_SIZE:
+                cache.clear()
+            for query, result in zip(misses, self.classify_batch(misses)):
+                found[query] = cache[query] = result
+        return [found[query] for query in queries]
+
+    def _calculate_match_score(self, query: str, query_words: set, keyword: str,
+                               keyword_words: Optional[frozenset] = None) -> float:
+        """
+        Calculate similarity score between query and keyword
+        keyword_words should be the precomputed token set from keyword_entries;
+        it is only derived here for ad-hoc calls
+        """
         # Check if keyword is substring of query or vice versa
         if keyword in query:
             return 0.9
         if query in keyword:
             return 0.7
 
+        if keyword_words is None:
+            keyword_words = frozenset(keyword.split())
+
         # Word overlap score
         if keyword_words and query_words:
+            # Most keywords share no token with the query - bail out without allocating
+            if keyword_words.isdisjoint(query_words):
+                return 0
             overlap = len(keyword_words & query_words)
-            union = len(keyword_words | query_words)
+            union = len(keyword_words) + len(query_words) - overlap
             jaccard = overlap / union if union > 0 else 0
 
             # Boost if all keyword words are in query
@@ -512,29 +959,13 @@ class TelecomClassifier:
             'service': None
         }
 
-        # Detect device
-        for device in ['iphone', 'samsung', 'pixel']:
-            if re.search(self.patterns[device], query, re.IGNORECASE):
-                detected['device'] = device
-                break
-
-        # Detect plan type
-        for plan in ['prepaid', 'postpaid', 'unlimited', 'family']:
-            if re.search(self.patterns[plan], query, re.IGNORECASE):
-                detected['plan_type'] = plan
-                break
-
-        # Detect intent
-        for intent in ['buy', 'compare', 'price', 'review', 'support', 'upgrade']:
-            if re.search(self.patterns[intent], query, re.IGNORECASE):
-                detected['intent'] = intent
-                break
-
-        # Detect service
-        for service in ['5g', 'internet', 'streaming', 'international']:
-            if re.search(self.patterns[service], query, re.IGNORECASE):
-                detected['service'] = service
-                break
+        # One scan finds every pattern hit; per slot the highest-priority pattern wins
+        best_rank = {}
+        for match in self._pattern_scanner.finditer(query.lower()):
+            slot, rank, name = self._pattern_slots[match.lastgroup]
+            if rank < best_rank.get(slot, len(self.patterns)):
+                best_rank[slot] = rank
+                detected[slot] = name
 
         # Build classification from detected patterns
         if any(detected.values()):
@@ -611,8 +1042,11 @@ class TelecomClassifier:
             'match_type': 'pattern'
         }
 
-    def _format_result(self, match: Dict, query: str, confidence: float) -> Dict:
-        """Format the classification result with brand detection"""
+    def _format_result(self, match: Dict, query: str, confidence: float, match_type: Optional[str] = None) -> Dict:
+        """
+        Format the classification result with brand detection
+        match_type: defaults to 'exact' from 0.95 confidence, else 'fuzzy'
+        """
         # Detect brand information
         brand_info = self._detect_brand(query)
 
@@ -638,7 +1072,7 @@ class TelecomClassifier:
                 'L5': match.get('L5', {})
             },
             'confidence_score': confidence,
-            'match_type': 'exact' if confidence >= 0.95 else 'fuzzy'
+            'match_type': match_type or ('exact' if confidence >= 0.95 else 'fuzzy')
         }
 
     def get_all_categories(self) -> List[Dict]:
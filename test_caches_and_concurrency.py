@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Test Caches and Concurrency
+Coalesced requests share one batch call, SymSpell corrects typos within its
+bounds, export ETags survive rebuilds, and an upload that appends rows to an
+earlier one is recognised as its extension
+
+    python test_caches_and_concurrency.py
+"""
+
+import io
+import os
+import tempfile
+import threading
+import time
+
+from export_results import ExportCache
+from fuzzy_index import SymSpellIndex
+from request_coalescer import RequestCoalescer
+from upload_reader import UploadIndex, receive_upload
+
+BOUNDARY = b'test-boundary'
+
+SYMSPELL_COUNTS = {'unlimited': 40, 'unlisted': 2, 'coverage': 25, 'prepaid': 30, 'plan': 50}
+# token -> correction (None: nothing close enough)
+SYMSPELL_CASES = [
+    ('unlimited', 'unlimited'),   # known tokens are returned as they are
+    ('unlimted', 'unlimited'),    # one deletion
+    ('unlimitde', 'unlimited'),   # transposition (long token: up to two edits)
+    ('covrage', 'coverage'),      # short token: one edit
+    ('prpaed', None),             # short token, two edits
+    ('pln', None),                # below MIN_TOKEN_LENGTH
+]
+
+RESULTS_CSV = (
+    'query,L1_category,L2_subcategory,topical_group\n'
+    'iphone 15 price,Devices,Smartphones,iPhone\n'
+    'unlimited plan,Plans,Postpaid,Unlimited\n'
+)
+
+
+def test_coalesced_batches_share_one_call():
+    """Requests arriving while a batch runs are answered by one shared call, each query computed once"""
+    calls = []
+    gate = threading.Event()
+
+    def batch_fn(queries):
+        calls.append(list(queries))
+        if len(calls) == 1:
+            gate.wait(10)
+        return [{'query': query} for query in queries]
+
+    coalescer = RequestCoalescer(batch_fn, window=10)
+    requests = [['a', 'b']] + [['a', 'b', f"q{i}", 'shared'] for i in range(6)]
+    results = [None] * len(requests)
+
+    def run(index):
+        results[index] = coalescer.classify(requests[index])
+
+    threads = [threading.Thread(target=run, args=(index,)) for index in range(len(requests))]
+    threads[0].start()
+    # The first request is computing ('a', 'b') and holds the gate
+    deadline = time.time() + 10
+    while not calls and time.time() < deadline:
+        time.sleep(0.001)
+    for thread in threads[1:]:
+        thread.start()
+    # Every later request is parked on the running batch or the one it opened
+    while coalescer._waiting < len(requests) - 1 and time.time() < deadline:
+        time.sleep(0.001)
+    gate.set()
+    for thread in threads:
+        thread.join(10)
+
+    assert len(calls) == 2, calls
+    assert calls[0] == ['a', 'b'], calls
+    assert sorted(calls[1]) == sorted([f"q{i}" for i in range(6)] + ['shared']), calls
+    for request, result in zip(requests, results):
+        assert result == [{'query': query} for query in request], (request, result)
+    print(f"  ok  {len(requests)} requests -> {len(calls)} batch calls")
+
+
+def test_cached_requests_skip_batches():
+    """A request whose queries are all cached never reaches batch_fn"""
+    cache = {'a': {'query': 'a'}, 'b': None}
+
+    def batch_fn(queries):
+        raise AssertionError(f"batch_fn called for cached queries {queries}")
+
+    coalescer = RequestCoalescer(batch_fn, cache=lambda: cache)
+    assert coalescer.classify(['a', 'b', 'a']) == [{'query': 'a'}, None, {'query': 'a'}]
+    print("  ok  fully cached request answered from the cache")
+
+
+def test_symspell_corrections():
+    """Corrections stay within the length-dependent edit distance"""
+    index = SymSpellIndex(SYMSPELL_COUNTS)
+    for token, expected in SYMSPELL_CASES:
+        assert index.correct(token) == expected, (token, index.correct(token), expected)
+        print(f"  ok  {token!r:12} -> {expected!r}")
+
+
+def test_export_etag_stable_across_rebuilds():
+    """The ETag names the results content: a rebuilt artifact keeps it, new content changes it"""
+    with tempfile.TemporaryDirectory() as directory:
+        csv_path = os.path.join(directory, 'results.csv')
+        with open(csv_path, 'w') as f:
+            f.write(RESULTS_CSV)
+        cache = ExportCache(os.path.join(directory, 'exports'))
+
+        artifact, etag = cache.get(csv_path, 'grouped-csv')
+        assert os.path.isfile(artifact)
+        os.remove(artifact)
+        rebuilt, rebuilt_etag = cache.get(csv_path, 'grouped-csv')
+        assert (rebuilt, rebuilt_etag) == (artifact, etag)
+        assert os.path.isfile(rebuilt)
+        # Another process (a fresh cache) computes the same ETag
+        assert ExportCache(cache.cache_dir).get(csv_path, 'grouped-csv')[1] == etag
+        print(f"  ok  rebuilt export keeps ETag {etag}")
+
+        with open(csv_path, 'a') as f:
+            f.write('prepaid plans,Plans,Prepaid,Prepaid\n')
+        assert cache.get(csv_path, 'grouped-csv')[1] != etag
+        print("  ok  changed results get a new ETag")
+
+
+def multipart_body(filename, content):
+    return (b'--' + BOUNDARY + b'\r\n'
+            + f'Content-Disposition: form-data; name="file"; filename="{filename}"\r\n'.encode()
+            + b'Content-Type: text/csv\r\n\r\n'
+            + content + b'\r\n--' + BOUNDARY + b'--\r\n')
+
+
+def upload(directory, name_prefix, content, checkpoints=()):
+    return receive_upload(io.BytesIO(multipart_body('queries.csv', content)), BOUNDARY, directory,
+                          {'csv'}, name_prefix, checkpoints=checkpoints)
+
+
+def test_appended_upload_reuses_prefix():
+    """An upload extending an indexed one by whole rows finds it; a changed prefix does not"""
+    rows = b'Query\niphone 15 price\nunlimited plan\n'
+    with tempfile.TemporaryDirectory() as directory:
+        index = UploadIndex(os.path.join(directory, 'upload_index.json'))
+        first = upload(directory, 'first', rows)
+        with open(os.path.join(directory, 'results_first.csv'), 'w') as f:
+            f.write(RESULTS_CSV)
+        index.add({'sha256': first['sha256'], 'taxonomy_version': 'v1', 'columns': None,
+                   'ext': first['ext'], 'size': first['size'], 'results_filename': 'results_first.csv',
+                   'total_rows': 2})
+
+        candidates = index.prefix_candidates('v1')
+        checkpoints = [entry['size'] for entry in candidates]
+        appended = upload(directory, 'appended', rows + b'prepaid plans\n', checkpoints)
+        base = UploadIndex.find_prefix(appended, None, candidates)
+        assert base is not None and base['sha256'] == first['sha256'], base
+        assert base['total_rows'] == 2
+        print(f"  ok  appended upload extends the first {base['total_rows']} rows")
+
+        assert UploadIndex.find_prefix(appended, ['Volume'], candidates) is None
+        assert index.prefix_candidates('v2') == []
+        edited = upload(directory, 'edited', rows.replace(b'iphone', b'pixel') + b'prepaid plans\n', checkpoints)
+        assert UploadIndex.find_prefix(edited, None, candidates) is None
+        print("  ok  other columns, taxonomy or edited rows are not reused")
+
+
+if __name__ == "__main__":
+    print("Request coalescing:")
+    test_coalesced_batches_share_one_call()
+    test_cached_requests_skip_batches()
+    print("SymSpell:")
+    test_symspell_corrections()
+    print("Export ETags:")
+    test_export_etag_stable_across_rebuilds()
+    print("Appended uploads:")
+    test_appended_upload_reuses_prefix()
+    print("All checks passed")
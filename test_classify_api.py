@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+Test Classify API
+/api/classify rejects bodies that are not query strings, enforces the
+per-request query limit, and answers concurrent requests through the
+request coalescer. /api/classify/stream reads NDJSON and CSV lines, reports
+invalid lines in place, and refuses other formats and oversized bodies
+
+    python test_classify_api.py
+"""
+
+import io
+import json
+import os
+import threading
+import time
+
+import app as app_module
+from request_coalescer import RequestCoalescer
+from telecom_classifier import TelecomClassifier
+
+TREE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'telecom-classification-10K.json')
+
+# request body -> why it is rejected with 400
+BAD_BODIES = [
+    (b'', 'empty body'),
+    (b'iphone 15 price', 'not JSON'),
+    (b'"iphone 15 price"', 'bare string'),
+    (b'{}', 'no query or queries'),
+    (b'{"query": 15}', 'non-string query'),
+    (b'{"query": null}', 'null query'),
+    (b'{"queries": "iphone 15 price"}', 'queries not a list'),
+    (b'{"queries": ["iphone 15 price", 15]}', 'non-string in queries'),
+    (b'[["iphone 15 price"]]', 'nested list'),
+]
+
+# NDJSON body -> expected output lines: a query's result, or the line number of an error
+NDJSON_BODY = (b'"iphone 15 price"\n'
+               b'{"query": "unlimited data plan"}\n'
+               b'\n'
+               b'not json\n'
+               b'15\n'
+               b'{"q": "prepaid phone plans"}\n'
+               b'"zzzz qqqq"\n')
+NDJSON_EXPECTED = [('query', 'iphone 15 price'), ('query', 'unlimited data plan'), ('error', 4),
+                   ('error', 5), ('error', 6), ('query', 'zzzz qqqq')]
+
+# CSV body -> queries in order (a query column header is used, otherwise the first column)
+CSV_CASES = [
+    (b'Volume,Keyword\n10,iphone 15 price\n20,"family plan, deals"\n', ['iphone 15 price', 'family plan, deals']),
+    (b'iphone 15 price,10\nunlimited data plan\n', ['iphone 15 price', 'unlimited data plan']),
+    (b'\xef\xbb\xbfQuery\r\nprepaid phone plans\r\n', ['prepaid phone plans']),
+]
+
+
+def get_client():
+    """Test client whose app classifies with the 10K tree next to this file"""
+    if app_module._classifier is None:
+        app_module._classifier = TelecomClassifier(TREE_PATH)
+    return app_module.app.test_client()
+
+
+def post_classify(client, body):
+    return client.post('/api/classify', data=body, content_type='application/json')
+
+
+def post_stream(client, body, content_type, chunked=False):
+    if chunked:
+        # No Content-Length: the body is read until it ends, as gunicorn does for chunked requests
+        return client.post('/api/classify/stream', input_stream=io.BytesIO(body), content_type=content_type,
+                           environ_overrides={'CONTENT_LENGTH': '', 'wsgi.input_terminated': True})
+    return client.post('/api/classify/stream', data=body, content_type=content_type)
+
+
+def stream_lines(response):
+    assert response.status_code == 200, (response.status_code, response.data)
+    assert response.mimetype == 'application/x-ndjson'
+    assert response.data.endswith(b'\n')
+    return [json.loads(line) for line in response.data.splitlines()]
+
+
+def test_bad_bodies_rejected():
+    """An empty body, invalid JSON or anything but query strings is a 400 with an error"""
+    client = get_client()
+    for body, reason in BAD_BODIES:
+        response = post_classify(client, body)
+        assert response.status_code == 400, (reason, response.status_code)
+        assert 'error' in response.get_json(), (reason, response.get_json())
+        print(f"  ok  {reason:24} -> 400")
+
+
+def test_single_and_batch_results():
+    """{"query": ...} returns one result; a list returns results in input order"""
+    client = get_client()
+    classifier = app_module.get_classifier()
+    queries = ['iphone 15 price', 'unlimited data plan', 'zzzz qqqq']
+    expected = [classifier.classify_text(query) for query in queries]
+
+    payload = post_classify(client, json.dumps({'query': queries[0]})).get_json()
+    assert payload['result'] == expected[0], payload
+    assert payload['taxonomy_version'] == classifier.taxonomy_version
+    print("  ok  single query")
+
+    for body in (json.dumps({'queries': queries}), json.dumps(queries)):
+        payload = post_classify(client, body).get_json()
+        assert payload['count'] == len(queries) and payload['results'] == expected, payload
+    assert expected[2] is None
+    print("  ok  batch results in order (null when unclassified)")
+
+
+def test_query_limit():
+    """MAX_CLASSIFY_BATCH queries are classified; one more is a 413 before any classification"""
+    client = get_client()
+    limit = app_module.app.config['MAX_CLASSIFY_BATCH']
+    assert limit == 10000
+
+    response = post_classify(client, json.dumps(['iphone 15 price'] * limit))
+    assert response.status_code == 200 and response.get_json()['count'] == limit
+    print(f"  ok  {limit} queries -> 200")
+
+    def refuse(queries):
+        raise AssertionError(f"{len(queries)} queries classified past the limit")
+
+    original = app_module.classify_coalescer
+    app_module.classify_coalescer = RequestCoalescer(refuse, window=0)
+    try:
+        response = post_classify(client, json.dumps(['iphone 15 price'] * (limit + 1)))
+    finally:
+        app_module.classify_coalescer = original
+    assert response.status_code == 413, response.status_code
+    assert str(limit) in response.get_json()['error']
+    print(f"  ok  {limit + 1} queries -> 413")
+
+
+def test_concurrent_requests_coalesced():
+    """Requests arriving while a batch runs share one batch call and get their own results"""
+    classifier = app_module.get_classifier()
+    calls = []
+    gate = threading.Event()
+
+    def batch_fn(queries):
+        calls.append(list(queries))
+        if len(calls) == 1:
+            gate.wait(10)
+        return classifier.classify_batch(queries)
+
+    requests = [['prepaid phone plans']] + [[f"iphone {i} price", 'family plan deals'] for i in range(11, 16)]
+    responses = [None] * len(requests)
+
+    def run(index):
+        responses[index] = post_classify(get_client(), json.dumps({'queries': requests[index]}))
+
+    coalescer = RequestCoalescer(batch_fn, window=10)
+    original = app_module.classify_coalescer
+    app_module.classify_coalescer = coalescer
+    try:
+        threads = [threading.Thread(target=run, args=(index,)) for index in range(len(requests))]
+        threads[0].start()
+        deadline = time.time() + 10
+        while not calls and time.time() < deadline:
+            time.sleep(0.001)
+        for thread in threads[1:]:
+            thread.start()
+        while coalescer._waiting < len(requests) - 1 and time.time() < deadline:
+            time.sleep(0.001)
+        gate.set()
+        for thread in threads:
+            thread.join(10)
+    finally:
+        app_module.classify_coalescer = original
+
+    assert len(calls) == 2, calls
+    assert sorted(calls[1]) == sorted({query for request in requests[1:] for query in request}), calls
+    for request, response in zip(requests, responses):
+        assert response.status_code == 200, response.status_code
+        assert response.get_json()['results'] == classifier.classify_batch(request), request
+    print(f"  ok  {len(requests)} requests -> {len(calls)} batch calls")
+
+
+def test_stream_ndjson():
+    """Each NDJSON line gets its result or {"line": n, "error": ...}, in order, across batches"""
+    client = get_client()
+    classifier = app_module.get_classifier()
+    original = app_module.app.config['STREAM_BATCH_SIZE']
+    for batch_size in (original, 2):
+        app_module.app.config['STREAM_BATCH_SIZE'] = batch_size
+        try:
+            lines = stream_lines(post_stream(client, NDJSON_BODY, 'application/x-ndjson'))
+        finally:
+            app_module.app.config['STREAM_BATCH_SIZE'] = original
+        assert len(lines) == len(NDJSON_EXPECTED), lines
+        for line, (kind, value) in zip(lines, NDJSON_EXPECTED):
+            if kind == 'query':
+                assert line == {'query': value, 'result': classifier.classify_text(value)}, line
+            else:
+                assert line['line'] == value and line['error'] and 'result' not in line, line
+        print(f"  ok  batch size {batch_size}: {len(lines)} lines, errors on lines 4-6")
+
+
+def test_stream_csv():
+    """CSV lines are classified from the query column, or the first column without a header"""
+    client = get_client()
+    classifier = app_module.get_classifier()
+    for body, queries in CSV_CASES:
+        lines = stream_lines(post_stream(client, body, 'text/csv'))
+        assert lines == [{'query': query, 'result': classifier.classify_text(query)} for query in queries], lines
+        print(f"  ok  {body[:24]!r:34} -> {queries}")
+
+
+def test_stream_rejections():
+    """Other content types get a 415; bodies over MAX_CONTENT_LENGTH a 413, with or without Content-Length"""
+    client = get_client()
+    for content_type in ('application/json', 'text/plain', 'application/octet-stream'):
+        response = post_stream(client, b'"iphone 15 price"\n', content_type)
+        assert response.status_code == 415, (content_type, response.status_code)
+        assert 'error' in response.get_json()
+        print(f"  ok  {content_type:24} -> 415")
+
+    original = app_module.app.config['MAX_CONTENT_LENGTH']
+    app_module.app.config['MAX_CONTENT_LENGTH'] = 1000
+    try:
+        line = b'"iphone 15 price"\n'
+        for chunked in (False, True):
+            response = post_stream(client, line * 100, 'application/x-ndjson', chunked)
+            assert response.status_code == 413, (chunked, response.status_code)
+            assert 'error' in response.get_json()
+            assert len(stream_lines(post_stream(client, line * 50, 'application/x-ndjson', chunked))) == 50
+            print(f"  ok  {'chunked' if chunked else 'Content-Length':14} over the limit -> 413, under it -> 200")
+    finally:
+        app_module.app.config['MAX_CONTENT_LENGTH'] = original
+
+
+if __name__ == "__main__":
+    print("Bad bodies:")
+    test_bad_bodies_rejected()
+    print("Results:")
+    test_single_and_batch_results()
+    print("Query limit:")
+    test_query_limit()
+    print("Coalescing:")
+    test_concurrent_requests_coalesced()
+    print("Streaming:")
+    test_stream_ndjson()
+    test_stream_csv()
+    test_stream_rejections()
+    print("All checks passed")
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Test Metrics
+The Prometheus text rendering, the merging of the files every worker process
+writes, and retire() folding an exited worker's file into retired.json without
+changing the totals. Worker processes are simulated by writing their files
+
+    python test_metrics.py
+"""
+
+import json
+import os
+import tempfile
+from contextlib import contextmanager
+
+import metrics
+
+REQUESTS = metrics.Counter('test_requests_total', 'Requests in this test, by route', ['route'])
+# Buckets given out of order are sorted
+LATENCY = metrics.Histogram('test_latency_seconds', 'Latency in this test', buckets=(1, 0.1))
+
+# pid -> the values its worker wrote (name -> JSON-encoded label values -> state)
+WORKER_FILES = {
+    111: {'test_requests_total': {'["upload"]': 2.0, '["classify"]': 5.0},
+          'test_latency_seconds': {'[]': [1, 0, 1, 5.05]}},
+    222: {'test_requests_total': {'["classify"]': 1.0},
+          'test_latency_seconds': {'[]': [0, 1, 0, 0.5]}},
+}
+
+# This process, plus both workers
+EXPECTED_TOTALS = [
+    'test_requests_total{route="classify"} 9.0',
+    'test_requests_total{route="upload"} 2.0',
+    'test_latency_seconds_bucket{le="0.1"} 2',
+    'test_latency_seconds_bucket{le="1.0"} 4',
+    'test_latency_seconds_bucket{le="+Inf"} 5',
+    'test_latency_seconds_count 5',
+]
+
+
+def reset():
+    for metric in (REQUESTS, LATENCY):
+        for child in metric._children.values():
+            child._reset()
+
+
+def count_locally():
+    reset()
+    REQUESTS.labels('classify').inc(3)
+    LATENCY.observe(0.05)
+    LATENCY.observe(0.5)
+
+
+def samples(text, name):
+    """The sample lines of one metric in rendered output"""
+    return [line for line in text.splitlines() if line.startswith(name) and not line.startswith('#')]
+
+
+@contextmanager
+def shared_directory(directory):
+    """Act as a process configured with directory, without starting its flusher"""
+    saved = metrics._directory, metrics._process_file, metrics._last_written
+    metrics._directory, metrics._process_file, metrics._last_written = directory, '999-self.json', None
+    try:
+        yield
+    finally:
+        metrics._directory, metrics._process_file, metrics._last_written = saved
+
+
+def read_json(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def write_worker_files(directory):
+    for pid, values in WORKER_FILES.items():
+        with open(os.path.join(directory, f"{pid}-abcdef.json"), 'w') as f:
+            json.dump(values, f)
+
+
+def test_render():
+    """HELP and TYPE lines, labelled counters, cumulative histogram buckets with _sum and _count"""
+    count_locally()
+    REQUESTS.labels('say "hi"\n').inc()
+    text = metrics.render()
+    assert text.endswith('\n')
+    assert '# HELP test_requests_total Requests in this test, by route\n# TYPE test_requests_total counter' in text
+    assert '# TYPE test_latency_seconds histogram' in text
+    assert samples(text, 'test_requests_total') == [
+        'test_requests_total{route="classify"} 3.0',
+        'test_requests_total{route="say \\"hi\\"\\n"} 1.0',
+    ], samples(text, 'test_requests_total')
+    assert samples(text, 'test_latency_seconds') == [
+        'test_latency_seconds_bucket{le="0.1"} 1',
+        'test_latency_seconds_bucket{le="1.0"} 2',
+        'test_latency_seconds_bucket{le="+Inf"} 2',
+        'test_latency_seconds_sum 0.55',
+        'test_latency_seconds_count 2',
+    ], samples(text, 'test_latency_seconds')
+    del REQUESTS._children[('say "hi"\n',)]
+    print("  ok  counter and histogram rendered")
+
+
+def test_process_files_merged():
+    """render() adds every process's file to this process's own values"""
+    count_locally()
+    with tempfile.TemporaryDirectory() as directory:
+        write_worker_files(directory)
+        # Half-written files (before os.replace) are not read
+        with open(os.path.join(directory, '333-abcdef.json.tmp'), 'w') as f:
+            f.write('{"test_requests_total": {"[\\"classify\\"]": 10')
+        with shared_directory(directory):
+            text = metrics.render()
+            merged = samples(text, 'test_')
+            for line in EXPECTED_TOTALS:
+                assert line in merged, (line, merged)
+            sum_line = next(line for line in merged if line.startswith('test_latency_seconds_sum'))
+            assert abs(float(sum_line.split()[1]) - 6.1) < 1e-9, sum_line
+
+            # This process's own file is not counted twice
+            metrics.flush()
+            assert read_json(os.path.join(directory, '999-self.json'))['test_requests_total'] == \
+                {'["classify"]': 3.0}
+            assert samples(metrics.render(), 'test_') == merged
+    print(f"  ok  {len(WORKER_FILES)} worker files and this process merged")
+
+
+def test_retire_keeps_totals():
+    """retire() moves an exited worker's counts into retired.json and removes its file"""
+    count_locally()
+    with tempfile.TemporaryDirectory() as directory:
+        write_worker_files(directory)
+        with shared_directory(directory):
+            before = samples(metrics.render(), 'test_')
+
+            metrics.retire(directory, 11)
+            assert not os.path.exists(os.path.join(directory, metrics.RETIRED_FILE))
+            print("  ok  another pid's files are left alone")
+
+            for pid in WORKER_FILES:
+                metrics.retire(directory, pid)
+                retired = read_json(os.path.join(directory, metrics.RETIRED_FILE))
+                assert retired['folded'] == [f"{pid}-abcdef.json"], retired
+                assert not os.path.exists(os.path.join(directory, f"{pid}-abcdef.json"))
+                assert samples(metrics.render(), 'test_') == before
+                print(f"  ok  worker {pid} retired, totals unchanged")
+
+            assert retired['metrics']['test_requests_total'] == {'["upload"]': 2.0, '["classify"]': 6.0}
+            assert retired['metrics']['test_latency_seconds'] == {'[]': [1, 1, 1, 5.55]}
+            assert sorted(os.listdir(directory)) == [metrics.RETIRED_FILE]
+            print("  ok  retired.json holds both workers")
+
+
+if __name__ == "__main__":
+    print("Rendering:")
+    test_render()
+    print("Merging process files:")
+    test_process_files_merged()
+    print("Retiring workers:")
+    test_retire_keeps_totals()
+    print("All checks passed")
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Test Query Normalization
+Spelling variants resolve to one key, brand variants take the taxonomy's own
+spelling, and a query that is literally a taxonomy keyword keeps that
+keyword's own classification
+
+    python test_normalization.py
+"""
+
+import os
+
+from telecom_classifier import TelecomClassifier, normalize_query
+
+DECISION_TREE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'telecom-classification-10K.json')
+
+NORMALIZATION_CASES = [
+    ('iPhone-15  Pro', 'iphone 15 pro'),
+    ('iphone15pro', 'iphone 15 pro'),
+    ('iphone 15 pro?', 'iphone 15 pro'),
+    ('$30.00', '$30'),
+    ('at&t', 'att'),
+    ('Metro PCS deals', 'metro deals'),
+    ('metropcs plans', 'metro plans'),
+    ('straighttalk unlimited', 'straight talk unlimited'),
+    ('talk straight', 'talk straight'),
+    ('uscellular deals', 'us cellular deals'),
+]
+
+# Brand variants, reordered and partial brand queries -> L5 keyword they match;
+# the taxonomy files these carriers as "metro", "straight talk", "us cellular"
+BRAND_CASES = [
+    ('metro pcs deals', 'metro deals'),
+    ('metro pcs plans', 'metro plans'),
+    ('metropcs prepaid', 'metro prepaid'),
+    ('deals metro', 'metro deals'),
+    ('unlock talk straight', 'straight talk unlock'),
+    ('talk straight deals', 'straight talk deals'),
+    ('straighttalk unlimited', 'straight talk unlimited'),
+    ('unlimited cellular us', 'us cellular unlimited'),
+    ('uscellular deals', 'us cellular deals'),
+]
+
+# Query -> (L4 topic, L5 keyword) of the keyword it spells out verbatim; its
+# normalized key ('tmobile vs ...') belongs to a differently filed variant
+VERBATIM_CASES = [
+    ('t-mobile vs mint mobile price', 'Price Comparison', 't-mobile vs mint mobile price'),
+    ('t-mobile vs sprint coverage', 'Coverage Comparison', 't-mobile vs sprint coverage'),
+]
+
+
+def test_normalize_query():
+    """Variants from the normalization request map to the same key"""
+    for text, expected in NORMALIZATION_CASES:
+        assert normalize_query(text) == expected, (text, normalize_query(text), expected)
+        print(f"  ok  {text!r:26} -> {expected!r}")
+
+
+_classifier = None
+
+
+def get_classifier():
+    global _classifier
+    if _classifier is None:
+        _classifier = TelecomClassifier(DECISION_TREE_PATH)
+    return _classifier
+
+
+def test_brand_variants_match_taxonomy_spelling():
+    """Brand variants still share tokens with the keywords of that carrier"""
+    classifier = get_classifier()
+    for query, keyword in BRAND_CASES:
+        result = classifier.classify_text(query)
+        got = result and result['classification']['L5']['keyword']
+        assert got == keyword, (query, got, keyword)
+        print(f"  ok  {query!r:26} -> {keyword!r}")
+
+
+def test_verbatim_keywords_win():
+    """A literal keyword is classified as itself, not as a variant sharing its normalized key"""
+    classifier = get_classifier()
+    for query, topic, keyword in VERBATIM_CASES:
+        result = classifier.classify_text(query)
+        got = (result['classification']['L4']['topic'], result['classification']['L5']['keyword'])
+        assert got == (topic, keyword), (query, got)
+        # The batch path goes through the same stages
+        assert classifier.classify_batch([query])[0] == result
+        print(f"  ok  {query!r} -> {topic}")
+
+
+if __name__ == "__main__":
+    print("Normalization:")
+    test_normalize_query()
+    print("Brand variants:")
+    test_brand_variants_match_taxonomy_spelling()
+    print("Verbatim keywords:")
+    test_verbatim_keywords_win()
+    print("All checks passed")
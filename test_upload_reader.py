@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Test Upload Reader
+Encoding and delimiter sniffing, the Latin-1 re-read of files whose invalid
+bytes come after the sniffed sample, the column selection of the full parse,
+and the checks receive_upload makes before the rest of a body is read
+
+    python test_upload_reader.py
+"""
+
+import codecs
+import io
+import os
+import tempfile
+
+from upload_reader import (MAX_FORM_FIELD_BYTES, SNIFF_BYTES, MissingQueryColumnError, UploadReadError,
+                           UploadRejectedError, iter_upload_chunks, read_upload_file, receive_upload,
+                           sniff_delimiter, sniff_encoding)
+
+BOUNDARY = b'test-boundary'
+
+# sample bytes -> encoding
+ENCODING_CASES = [
+    (codecs.BOM_UTF8 + b'Query\nplan\n', 'utf-8-sig'),
+    (codecs.BOM_UTF16_LE + 'Query\n'.encode('utf-16-le'), 'utf-16'),
+    ('Query\ncafé plan\n'.encode('utf-8'), 'utf-8'),
+    # The sample may end inside a multi-byte character
+    ('Query\ncafé'.encode('utf-8')[:-1], 'utf-8'),
+    ('Query\ncafé plan\n'.encode('latin1'), 'latin1'),
+]
+
+# sample text -> delimiter
+DELIMITER_CASES = [
+    ('Query,Volume\nbest plan,10\n', ','),
+    ('Query\tVolume\nbest plan\t10\n', '\t'),
+    ('Query;Volume\nbest plan;10\n', ';'),
+    ('Query|Volume\nbest plan|10\n', '|'),
+    # One query per line with commas inside queries: nothing splits consistently
+    ('Query\nplans, deals and offers\niphone\n', '\t'),
+    ('', ','),
+    # An unclosed quote runs past the csv field limit under every delimiter
+    ('"Query,Volume\n' + 'x' * 200000 + '\n', ','),
+]
+
+CSV_ROWS = 'Query,Volume,Country,Notes\n007,10,US,first\nbest plan,20,CA,second\n'
+
+
+def write_file(directory, name, data):
+    path = os.path.join(directory, name)
+    with open(path, 'wb') as f:
+        f.write(data)
+    return path
+
+
+def test_sniff_encoding():
+    """BOMs win, then UTF-8 if the sample decodes, else Latin-1"""
+    for sample, expected in ENCODING_CASES:
+        assert sniff_encoding(sample) == expected, (sample, sniff_encoding(sample), expected)
+        print(f"  ok  {sample[:12]!r:40} -> {expected}")
+
+
+def test_sniff_delimiter():
+    """The delimiter splitting every line into the same number of fields"""
+    for text, expected in DELIMITER_CASES:
+        assert sniff_delimiter(text) == expected, (text, sniff_delimiter(text), expected)
+        print(f"  ok  {text[:20]!r:26} -> {expected!r}")
+
+
+class CountingStream(io.BytesIO):
+    """Request body that records how many bytes were read from it"""
+
+    def __init__(self, data):
+        super().__init__(data)
+        self.bytes_read = 0
+
+    def read(self, size=-1):
+        data = super().read(size)
+        self.bytes_read += len(data)
+        return data
+
+
+def multipart_body(file_bytes, columns=None):
+    body = b''
+    if columns is not None:
+        body += (b'--' + BOUNDARY + b'\r\nContent-Disposition: form-data; name="columns"\r\n\r\n'
+                 + columns + b'\r\n')
+    return (body + b'--' + BOUNDARY + b'\r\n'
+            + b'Content-Disposition: form-data; name="file"; filename="queries.csv"\r\n'
+            + b'Content-Type: text/csv\r\n\r\n' + file_bytes + b'\r\n--' + BOUNDARY + b'--\r\n')
+
+
+def test_bad_uploads_rejected_early():
+    """A bad header, a missing query column or an oversized form field stops the read early"""
+    rows = b''.join(b'%d,%d\n' % (i, i) for i in range(300000))
+    cases = [
+        ('missing query column', multipart_body(b'id,volume\n' + rows), MissingQueryColumnError),
+        ('unparseable header', multipart_body(b'"Query,Volume\n' + rows), UploadReadError),
+        ('oversized field', multipart_body(b'Query\nplan\n', b'x' * (4 * MAX_FORM_FIELD_BYTES)),
+         UploadRejectedError),
+    ]
+    with tempfile.TemporaryDirectory() as directory:
+        for name, body, error in cases:
+            stream = CountingStream(body)
+            try:
+                receive_upload(stream, BOUNDARY, directory, {'csv'}, 'upload')
+            except error:
+                pass
+            else:
+                raise AssertionError(f"{name}: upload accepted")
+            assert stream.bytes_read < len(body) // 2, (name, stream.bytes_read, len(body))
+            assert os.listdir(directory) == [], os.listdir(directory)
+            print(f"  ok  {name}: rejected after {stream.bytes_read} of {len(body)} bytes")
+
+        upload = receive_upload(CountingStream(multipart_body(b'Query\nplan\n', b'Volume')), BOUNDARY,
+                                directory, {'csv'}, 'upload')
+        assert upload['fields'] == {'columns': ['Volume']}, upload['fields']
+        print("  ok  small form fields kept")
+
+
+def test_invalid_bytes_after_sample_reread_as_latin1():
+    """A Latin-1 row after SNIFF_BYTES of ASCII comes back intact, not replaced"""
+    rows = b''.join(b'plan number %d,%d\n' % (i, i) for i in range(6000))
+    assert len(rows) > SNIFF_BYTES
+    with tempfile.TemporaryDirectory() as directory:
+        for name, header, tail in [('late.csv', b'Query,Volume\n', 'café plan,1\n'),
+                                   ('late.txt', b'', 'café plan\n')]:
+            body = rows if name.endswith('.csv') else rows.replace(b',', b' ')
+            path = write_file(directory, name, header + body + tail.encode('latin1'))
+            df = read_upload_file(path)
+            assert len(df) == 6001, (name, len(df))
+            assert df['Query'].iloc[-1] == 'café plan', (name, df['Query'].iloc[-1])
+            print(f"  ok  {name}: last row {df['Query'].iloc[-1]!r}")
+
+
+def test_column_selection():
+    """Only the query column and the requested metadata columns are read, in file order"""
+    with tempfile.TemporaryDirectory() as directory:
+        path = write_file(directory, 'rows.csv', CSV_ROWS.encode())
+        cases = [
+            (None, ['Query', 'Volume', 'Country', 'Notes']),
+            (['Country'], ['Query', 'Country']),
+            (['Notes', 'Volume', 'Missing'], ['Query', 'Volume', 'Notes']),
+            ([], ['Query']),
+        ]
+        for metadata_columns, expected in cases:
+            df = read_upload_file(path, metadata_columns)
+            assert list(df.columns) == expected, (metadata_columns, list(df.columns))
+            print(f"  ok  columns={metadata_columns} -> {expected}")
+
+        # The query column stays text (no "007" -> 7)
+        query_column, chunk = next(iter_upload_chunks(path, ['Volume']))
+        assert query_column == 'Query'
+        assert list(chunk['Query']) == ['007', 'best plan'], list(chunk['Query'])
+        print("  ok  query column read as str")
+
+        tsv = write_file(directory, 'rows.tsv', CSV_ROWS.replace(',', '\t').encode())
+        assert list(read_upload_file(tsv, ['Country'])['Country']) == ['US', 'CA']
+        print("  ok  tsv columns selected")
+
+
+if __name__ == "__main__":
+    print("Encoding:")
+    test_sniff_encoding()
+    print("Delimiter:")
+    test_sniff_delimiter()
+    print("Early rejection:")
+    test_bad_uploads_rejected_early()
+    print("Latin-1 after the sample:")
+    test_invalid_bytes_after_sample_reread_as_latin1()
+    print("Column selection:")
+    test_column_selection()
+    print("All checks passed")
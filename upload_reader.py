@@ -0,0 +1,478 @@
+#!/usr/bin/env python3
+"""
+Upload Reader
+Single-pass reading of uploaded query files (CSV, TSV, TXT, Excel):
+
+- Encoding (UTF-8 / UTF-8 BOM / UTF-16 BOM / Latin-1) and delimiter sniffed from the first bytes;
+  a UTF-8 file with invalid bytes past the sniffed part is re-read as Latin-1
+- Query column detected from the header sample before the full parse
+- Full parse with the C engine in chunks, reading only the query column plus
+  the requested metadata columns, with the query column pinned to str
+- receive_upload: multipart bodies streamed straight to disk with a running
+  sha256, header checked as soon as the first bytes arrive
+- UploadIndex: classified uploads by content hash + taxonomy version, so
+  repeats reuse their results and appended files classify only new rows
+"""
+
+import codecs
+import csv
+import hashlib
+import io
+import json
+import os
+import threading
+import time
+
+# pandas is imported inside the parsing functions: receiving an upload and
+# checking the index do not need it
+from werkzeug.sansio.multipart import Data, Epilogue, Field, File, MultipartDecoder, NeedData
+from werkzeug.utils import secure_filename
+
+import metrics
+
+SNIFF_BYTES = 64 * 1024
+CHUNK_ROWS = 200000
+UPLOAD_CHUNK_BYTES = 256 * 1024
+MAX_FORM_FIELD_BYTES = 500 * 1024
+# Decodes any byte sequence: the re-read of a UTF-8 file with invalid bytes after the sniffed part
+FALLBACK_ENCODING = 'latin1'
+# Uploads whose bytes can be extended by appending rows
+APPENDABLE_EXTENSIONS = {'csv', 'tsv', 'txt'}
+# Tried in order; the first one that splits every sample line into the same number of fields wins
+DELIMITERS = [',', '\t', ';', '|']
+QUERY_COLUMN_NAMES = ['query', 'keyword', 'keywords', 'search term', 'search query',
+                      'term', 'queries', 'search', 'phrase', 'key phrase']
+
+READ_SECONDS = metrics.Histogram('upload_read_seconds', 'Time to read and parse an uploaded file, by extension',
+                                 ['format'])
+
+
+class UploadReadError(ValueError):
+    """The file cannot be parsed"""
+
+
+class MissingQueryColumnError(UploadReadError):
+    """The file parses but no column looks like queries"""
+
+
+class UploadEncodingError(UploadReadError):
+    """Bytes past the sniffed sample are not valid in the sniffed encoding"""
+
+    def __init__(self, message, encoding):
+        super().__init__(message)
+        self.encoding = encoding
+
+
+class UploadRejectedError(UploadReadError):
+    """The request carries no usable file (message is shown to the user)"""
+
+
+def detect_query_column(df):
+    """Detect which column contains the queries/keywords"""
+    # Check exact matches (case-insensitive)
+    for col in df.columns:
+        if str(col).lower() in QUERY_COLUMN_NAMES:
+            return col
+
+    # Check partial matches
+    for col in df.columns:
+        for name in QUERY_COLUMN_NAMES:
+            if name in str(col).lower():
+                return col
+
+    # Default to first column if text-heavy
+    if len(df.columns) > 0:
+        first_col = df.columns[0]
+        # Check if first column looks like queries (mostly strings, reasonable length)
+        if df[first_col].dtype == 'object':
+            return first_col
+
+    return None
+
+
+def sniff_encoding(sample):
+    """Encoding of a file from its first bytes"""
+    if sample.startswith(codecs.BOM_UTF8):
+        return 'utf-8-sig'
+    if sample.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return 'utf-16'
+    try:
+        # Incremental decode - the sample may end inside a multi-byte character
+        codecs.getincrementaldecoder('utf-8')().decode(sample, final=False)
+        return 'utf-8'
+    except UnicodeDecodeError:
+        return 'latin1'
+
+
+def decode_sample(sample, encoding, complete):
+    """Decoded sample text, cut back to the last full line unless it is the whole file"""
+    text = codecs.getincrementaldecoder(encoding)(errors='replace').decode(sample, final=complete)
+    if not complete and '\n' in text:
+        text = text[:text.rindex('\n') + 1]
+    return text
+
+
+def sniff_delimiter(text, default=','):
+    """
+    Delimiter that splits every sample line into the same number of fields
+    Multi-field splits are preferred; a file where nothing splits consistently
+    (one query per line, commas inside queries) falls back to a delimiter that
+    keeps each line whole
+    """
+    lines = [line for line in text.splitlines() if line.strip()]
+    if not lines:
+        return default
+
+    single_field = None
+    for delimiter in DELIMITERS:
+        try:
+            counts = {len(row) for row in csv.reader(lines, delimiter=delimiter)}
+        except csv.Error:
+            # e.g. an unclosed quote running past the field size limit
+            continue
+        if len(counts) != 1:
+            continue
+        if counts.pop() > 1:
+            return delimiter
+        if single_field is None:
+            single_field = delimiter
+    return single_field or default
+
+
+def inspect_header(sample, ext, complete, encoding=None):
+    """
+    Sniff the first bytes of a text file and parse its first lines
+    complete: sample is the whole file (otherwise the last partial line is dropped)
+    encoding: use this instead of the sniffed encoding
+    Returns (sample DataFrame, read_csv options for the full file)
+    """
+    import pandas as pd
+
+    encoding = encoding or sniff_encoding(sample)
+    text = decode_sample(sample, encoding, complete)
+    delimiter = '\t' if ext == 'tsv' else sniff_delimiter(text)
+
+    options = {'encoding': encoding, 'sep': delimiter}
+    try:
+        sample_df = pd.read_csv(io.StringIO(text), sep=delimiter)
+    except (pd.errors.ParserError, pd.errors.EmptyDataError) as e:
+        raise UploadReadError(f"Could not parse file header: {e}") from e
+    return sample_df, options
+
+
+def read_header_sample(filepath, encoding=None):
+    """inspect_header on the first SNIFF_BYTES of a file on disk"""
+    ext = filepath.rsplit('.', 1)[1].lower()
+    with open(filepath, 'rb') as f:
+        sample = f.read(SNIFF_BYTES)
+    complete = len(sample) < SNIFF_BYTES or os.path.getsize(filepath) == len(sample)
+    return inspect_header(sample, ext, complete, encoding)
+
+
+def check_upload_header(sample, ext, complete):
+    """Raise unless a CSV/TSV sample has a parseable header with a query column"""
+    if ext not in ('csv', 'tsv'):
+        # Workbooks are only readable once complete; text files are one query per line
+        return
+    sample_df, _ = inspect_header(sample, ext, complete)
+    if detect_query_column(sample_df) is None:
+        raise MissingQueryColumnError("No query column found")
+
+
+def receive_upload(stream, boundary, upload_folder, allowed_extensions, name_prefix,
+                   file_field='file', chunk_size=UPLOAD_CHUNK_BYTES, checkpoints=()):
+    """
+    Stream a multipart/form-data body to disk without buffering it
+    - The file part is written to upload_folder as {name_prefix}_{filename}
+      while its sha256 is computed
+    - Its header is checked once SNIFF_BYTES have arrived, so a file without a
+      query column is rejected before the rest of the body is read
+    - checkpoints: byte offsets at which the sha256 of the file so far is also
+      recorded (prefix_hashes), to recognise files that extend earlier uploads
+    Returns {'path', 'filename', 'ext', 'sha256', 'size', 'prefix_hashes', 'fields'}
+    (fields: name -> [values], each at most MAX_FORM_FIELD_BYTES)
+    Raises UploadRejectedError / UploadReadError; nothing is left on disk on failure
+    """
+    decoder = MultipartDecoder(boundary, max_form_memory_size=MAX_FORM_FIELD_BYTES)
+    fields = {}
+    upload = None
+    part = None
+    file_part = None
+    field_data = []
+    field_size = 0
+    out = None
+    digest = None
+    head = bytearray()
+    checked = False
+    partial_path = None
+    pending_checkpoints = sorted(offset for offset in set(checkpoints) if offset > 0)
+
+    try:
+        while True:
+            data = stream.read(chunk_size)
+            decoder.receive_data(data or None)
+            event = decoder.next_event()
+            while not isinstance(event, (Epilogue, NeedData)):
+                if isinstance(event, File) and event.name == file_field and upload is None:
+                    part = file_part = event
+                    if not event.filename:
+                        raise UploadRejectedError('No file selected')
+                    filename = secure_filename(event.filename)
+                    ext = filename.rsplit('.', 1)[1].lower() if '.' in filename else ''
+                    if ext not in allowed_extensions:
+                        raise UploadRejectedError('Invalid file type. Please upload CSV, Excel, or TXT file')
+                    saved_filename = f"{name_prefix}_{filename}"
+                    partial_path = os.path.join(upload_folder, saved_filename + '.part')
+                    out = open(partial_path, 'wb')
+                    digest = hashlib.sha256()
+                    upload = {'path': os.path.join(upload_folder, saved_filename), 'filename': saved_filename,
+                              'ext': ext, 'sha256': None, 'size': 0, 'prefix_hashes': {}, 'fields': fields}
+                elif isinstance(event, (Field, File)):
+                    # Form fields are small; any further file parts are discarded
+                    part = event
+                    field_data = []
+                    field_size = 0
+                elif isinstance(event, Data):
+                    if file_part is not None and part is file_part:
+                        out.write(event.data)
+                        position = upload['size']
+                        while pending_checkpoints and pending_checkpoints[0] <= position + len(event.data):
+                            offset = pending_checkpoints.pop(0)
+                            prefix_digest = digest.copy()
+                            prefix_digest.update(event.data[:offset - position])
+                            upload['prefix_hashes'][offset] = prefix_digest.hexdigest()
+                        digest.update(event.data)
+                        upload['size'] += len(event.data)
+                        if not checked:
+                            head += event.data
+                            if len(head) >= SNIFF_BYTES or not event.more_data:
+                                check_upload_header(bytes(head), ext, complete=not event.more_data)
+                                checked = True
+                                head = None
+                        if not event.more_data:
+                            out.close()
+                            os.replace(partial_path, upload['path'])
+                            partial_path = None
+                            upload['sha256'] = digest.hexdigest()
+                    elif isinstance(part, Field):
+                        # max_form_memory_size only bounds the decoder's buffer, not the value
+                        field_size += len(event.data)
+                        if field_size > MAX_FORM_FIELD_BYTES:
+                            raise UploadRejectedError(f'Form field "{part.name}" is too large')
+                        field_data.append(event.data)
+                        if not event.more_data:
+                            value = b''.join(field_data).decode('utf-8', 'replace')
+                            fields.setdefault(part.name, []).append(value)
+                event = decoder.next_event()
+            if not data or isinstance(event, Epilogue):
+                break
+        if upload is None:
+            raise UploadRejectedError('No file provided')
+        if upload['sha256'] is None:
+            raise UploadReadError("Upload ended before the file was complete")
+    except Exception as e:
+        # Includes RequestEntityTooLarge from a size-limited stream
+        if out is not None:
+            out.close()
+        if partial_path and os.path.exists(partial_path):
+            os.remove(partial_path)
+        if isinstance(e, ValueError) and not isinstance(e, UploadReadError):
+            # Malformed multipart body
+            raise UploadReadError(f"Could not read upload: {e}") from e
+        raise
+    return upload
+
+
+def ends_at_line_boundary(filepath, offset):
+    """Whether the first offset bytes of a file end with a complete line"""
+    if offset <= 0:
+        return False
+    with open(filepath, 'rb') as f:
+        f.seek(offset - 1)
+        around = f.read(2)
+    return around[:1] == b'\n' or around[1:2] in (b'\n', b'\r')
+
+
+class UploadIndex:
+    """
+    Classified uploads by content: sha256 + taxonomy version + metadata column selection
+
+    Kept as a JSON file next to the results, so entries survive restarts and
+    are shared by worker processes (re-read whenever the file changes). An entry
+    records the upload's size and row count, which lets a later upload that
+    starts with the same bytes reuse its results for those rows.
+    Whenever an entry is added, entries whose results file (in results_dir) is
+    gone or older than max_age seconds are dropped, then the oldest past max_entries.
+    """
+
+    MAX_PREFIX_CANDIDATES = 64
+
+    def __init__(self, path, results_dir=None, max_entries=1000, max_age=30 * 24 * 3600):
+        self.path = path
+        self.results_dir = results_dir or os.path.dirname(path)
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._mtime = None
+
+    @staticmethod
+    def key(sha256, taxonomy_version, columns):
+        return json.dumps([sha256, taxonomy_version, columns])
+
+    def _refresh(self):
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return
+        if mtime != self._mtime:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self._entries = json.load(f)
+            self._mtime = mtime
+
+    def get(self, sha256, taxonomy_version, columns):
+        """Entry for an identical upload classified by the same taxonomy, or None"""
+        with self._lock:
+            self._refresh()
+            return self._entries.get(self.key(sha256, taxonomy_version, columns))
+
+    def prefix_candidates(self, taxonomy_version, max_size=None):
+        """Entries a larger upload could extend by appending rows, largest first"""
+        with self._lock:
+            self._refresh()
+            entries = [entry for entry in self._entries.values()
+                       if entry['taxonomy_version'] == taxonomy_version
+                       and entry['ext'] in APPENDABLE_EXTENSIONS
+                       and (max_size is None or entry['size'] < max_size)]
+        entries.sort(key=lambda entry: entry['size'], reverse=True)
+        return entries[:self.MAX_PREFIX_CANDIDATES]
+
+    @staticmethod
+    def find_prefix(upload, columns, candidates):
+        """Largest candidate whose bytes are a line-aligned prefix of upload"""
+        for entry in candidates:
+            if (entry['columns'] == columns and entry['ext'] == upload['ext']
+                    and upload['prefix_hashes'].get(entry['size']) == entry['sha256']
+                    and ends_at_line_boundary(upload['path'], entry['size'])):
+                return entry
+        return None
+
+    def add(self, entry):
+        """Record an entry (sha256, taxonomy_version, columns, ext, size, total_rows, results...)"""
+        with self._lock:
+            self._refresh()
+            self._entries[self.key(entry['sha256'], entry['taxonomy_version'], entry['columns'])] = entry
+            self._prune()
+            temp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._entries, f)
+            os.replace(temp_path, self.path)
+            self._mtime = os.stat(self.path).st_mtime_ns
+
+    def _prune(self):
+        """Keep the newest max_entries entries whose results file exists and is younger than max_age (lock held)"""
+        now = time.time()
+        alive = []
+        for key, entry in self._entries.items():
+            try:
+                written = os.stat(os.path.join(self.results_dir, entry['results_filename'])).st_mtime
+            except FileNotFoundError:
+                continue
+            if now - written < self.max_age:
+                alive.append((written, key, entry))
+        alive.sort(key=lambda item: item[0], reverse=True)
+        self._entries = {key: entry for _, key, entry in alive[:self.max_entries]}
+
+
+def _select_columns(columns, query_column, metadata_columns):
+    """Positions of the query column and the requested metadata columns, in file order"""
+    wanted = {query_column}
+    if metadata_columns is None:
+        wanted.update(columns)
+    else:
+        wanted.update(col for col in metadata_columns if col in columns)
+    return [position for position, col in enumerate(columns) if col in wanted]
+
+
+def iter_upload_chunks(filepath, metadata_columns=None, chunk_rows=CHUNK_ROWS, encoding=None):
+    """
+    Yield (query column, DataFrame chunk) for an uploaded file
+    metadata_columns: extra columns to keep next to the query column (None keeps all)
+    encoding: decode text files with this instead of the sniffed encoding
+    Raises UploadReadError for unreadable files, MissingQueryColumnError without a query column,
+    UploadEncodingError when a later byte does not decode (chunks before it were already yielded)
+    """
+    import pandas as pd
+
+    ext = filepath.rsplit('.', 1)[1].lower()
+
+    if ext in ('xlsx', 'xls'):
+        # Workbooks are parsed whole by the engine; only the column selection applies
+        try:
+            df = pd.read_excel(filepath)
+        except Exception as e:
+            raise UploadReadError(f"Could not read workbook: {e}") from e
+        query_column = detect_query_column(df)
+        if query_column is None:
+            raise MissingQueryColumnError("No query column found")
+        yield query_column, df.iloc[:, _select_columns(list(df.columns), query_column, metadata_columns)]
+        return
+
+    if ext == 'txt':
+        # One query per line
+        if encoding is None:
+            with open(filepath, 'rb') as f:
+                encoding = sniff_encoding(f.read(SNIFF_BYTES))
+        try:
+            with open(filepath, 'r', encoding=encoding) as f:
+                queries = [line.strip() for line in f if line.strip()]
+        except UnicodeDecodeError as e:
+            raise UploadEncodingError(f"File is not valid {encoding}: {e}", encoding) from e
+        yield 'Query', pd.DataFrame({'Query': queries})
+        return
+
+    if ext not in ('csv', 'tsv'):
+        raise UploadReadError(f"Unsupported file type: .{ext}")
+
+    sample_df, options = read_header_sample(filepath, encoding)
+    query_column = detect_query_column(sample_df)
+    if query_column is None:
+        raise MissingQueryColumnError("No query column found")
+    positions = _select_columns(list(sample_df.columns), query_column, metadata_columns)
+
+    reader = pd.read_csv(filepath, engine='c', chunksize=chunk_rows,
+                         usecols=positions, dtype={query_column: str}, **options)
+    empty = True
+    try:
+        with reader:
+            for chunk in reader:
+                empty = False
+                yield query_column, chunk
+    except pd.errors.ParserError as e:
+        raise UploadReadError(f"Could not parse file: {e}") from e
+    except UnicodeDecodeError as e:
+        # Only the first SNIFF_BYTES were sniffed
+        raise UploadEncodingError(f"File is not valid {options['encoding']}: {e}", options['encoding']) from e
+    if empty:
+        # Header-only file
+        yield query_column, sample_df.iloc[:, positions].astype({query_column: str})
+
+
+def read_upload_file(filepath, metadata_columns=None):
+    """
+    Read an uploaded file into a DataFrame (query column + metadata columns)
+    A UTF-8 file with invalid bytes past the sniffed sample is read again as Latin-1
+    """
+    import pandas as pd
+
+    with READ_SECONDS.labels(os.path.splitext(filepath)[1].lstrip('.').lower()).time():
+        try:
+            chunks = [chunk for _, chunk in iter_upload_chunks(filepath, metadata_columns)]
+        except UploadEncodingError as e:
+            if not e.encoding.startswith('utf-8'):
+                raise
+            chunks = [chunk for _, chunk in iter_upload_chunks(filepath, metadata_columns,
+                                                               encoding=FALLBACK_ENCODING)]
+        if len(chunks) == 1:
+            return chunks[0]
+        return pd.concat(chunks, ignore_index=True)